@@ -0,0 +1,88 @@
+"""
+Benchmark for message_parts decoding: the original per-row json.loads
+implementation against the shared, cached parser in message_parsing.py.
+
+Usage:
+    python benchmarks/bench_message_parsing.py --rows 500000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from message_parsing import clear_message_cache, extract_message_content  # noqa: E402
+
+# Mix of repeated templates and unique customer text, roughly like a real export
+TEMPLATE_PAYLOADS = [
+    [{"text": {"content": "Hello! Welcome to our support line. How can I help you today?"}}],
+    [{"text": {"content": "Please choose an option:\n1. Buy token\n2. Check balance"}}],
+    [{"text": {"content": "Please hold while I connect you to an agent."}}],
+    [{"image": {"url": "https://example.com/receipt.jpg"}}],
+    [{"file": {"name": "statement.pdf"}}],
+]
+
+
+def original_extract_message_content(message_parts_str):
+    """Verbatim copy of the pre-refactor intent_detection.py parser (warnings removed)."""
+    if pd.isna(message_parts_str) or not isinstance(message_parts_str, str):
+        return ""
+    message_content = []
+    try:
+        message_parts = json.loads(message_parts_str)
+        if not isinstance(message_parts, list):
+            raise ValueError("message_parts is not a list")
+        for part in message_parts:
+            if 'text' in part and isinstance(part.get('text'), dict) and 'content' in part['text']:
+                content = part['text']['content']
+                if content:
+                    message_content.append(content)
+            elif 'image' in part and isinstance(part.get('image'), dict) and 'url' in part['image']:
+                message_content.append("[Image Attached]")
+            elif 'file' in part and isinstance(part.get('file'), dict) and 'name' in part['file']:
+                message_content.append(f"[File: {part['file']['name']}]")
+    except (json.JSONDecodeError, ValueError):
+        return str(message_parts_str)
+    return " ".join(message_content).strip()
+
+
+def make_payloads(rows, template_share, seed):
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(rows):
+        if rng.random() < template_share:
+            parts = rng.choice(TEMPLATE_PAYLOADS)
+        else:
+            parts = [{"text": {"content": f"my meter number is {rng.randrange(10**10)} please help {i}"}}]
+        payloads.append(json.dumps(parts))
+    return pd.Series(payloads)
+
+
+def time_rows_per_sec(func, payloads):
+    start = time.perf_counter()
+    result = payloads.apply(func)
+    elapsed = time.perf_counter() - start
+    return result, len(payloads) / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--template-share", type=float, default=0.6, help="Fraction of rows that are repeated templates")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.rows, args.template_share, args.seed)
+    before, before_rate = time_rows_per_sec(original_extract_message_content, payloads)
+    clear_message_cache()
+    after, after_rate = time_rows_per_sec(extract_message_content, payloads)
+
+    assert before.equals(after), "shared parser output differs from the original"
+    print(f"rows: {args.rows}  template share: {args.template_share:.0%}")
+    print(f"before (json.loads per row): {before_rate:12,.0f} rows/sec")
+    print(f"after  (message_parsing):    {after_rate:12,.0f} rows/sec  ({after_rate / before_rate:.1f}x)")
@@ -0,0 +1,114 @@
+"""
+Benchmark cases for the transcript pipelines, shared by run_benchmarks.py
+(fresh interpreter per run, baseline comparison) and test_benchmarks.py
+(the same cases under pytest).
+
+The pipeline modules are imported inside the cases, so a case only pays for
+what it uses.
+"""
+import contextlib
+import os
+import tempfile
+import time
+
+CASES = [
+    "extract_message_content", "assign_intent", "process_chat_transcript", "per_message_intents",
+    "divide_csv_file", "export_jsonl",
+]
+
+SPLIT_PARTS = 4
+
+
+# --- Cases ---
+# Each case takes the input CSV and a scratch directory (the working directory
+# during the run), does its untimed setup, and returns (seconds, items, unit).
+
+def _bench_extract_message_content(input_csv, work_dir):
+    import pandas as pd
+    from message_parsing import clear_message_cache, extract_message_content
+
+    payloads = pd.read_csv(input_csv, usecols=['message_parts'])['message_parts']
+    clear_message_cache()
+    start = time.perf_counter()
+    payloads.map(extract_message_content)
+    return time.perf_counter() - start, len(payloads), "rows"
+
+
+def _bench_assign_intent(input_csv, work_dir):
+    import pandas as pd
+    from intent_detection import assign_intent
+    from message_parsing import extract_message_content
+
+    df = pd.read_csv(input_csv, usecols=['conversation_id', 'message_parts'])
+    df['text'] = df['message_parts'].map(extract_message_content)
+    texts = df.groupby('conversation_id', sort=False)['text'].agg(" ".join).tolist()
+    start = time.perf_counter()
+    for text in texts:
+        assign_intent(text)
+    return time.perf_counter() - start, len(texts), "conversations"
+
+
+def _count_rows(input_csv):
+    with open(input_csv, 'rb') as f:
+        return sum(1 for _ in f) - 1 # Synthetic payloads never contain raw newlines
+
+
+def _bench_process_chat_transcript(input_csv, work_dir):
+    from intent_detection import process_chat_transcript
+
+    rows = _count_rows(input_csv)
+    start = time.perf_counter()
+    if not process_chat_transcript(input_csv, os.path.join(work_dir, "intents.csv")):
+        raise RuntimeError("process_chat_transcript failed")
+    return time.perf_counter() - start, rows, "rows"
+
+
+def _bench_per_message_intents(input_csv, work_dir):
+    from intent_detection import process_chat_transcript
+
+    rows = _count_rows(input_csv)
+    start = time.perf_counter()
+    if not process_chat_transcript(input_csv, os.path.join(work_dir, "intents.csv"), per_message=True):
+        raise RuntimeError("process_chat_transcript failed")
+    return time.perf_counter() - start, rows, "rows"
+
+
+def _bench_divide_csv_file(input_csv, work_dir):
+    from divide_csv import divide_csv_file
+
+    rows = _count_rows(input_csv)
+    output_names = [os.path.join(work_dir, f"part_{i}.csv") for i in range(SPLIT_PARTS)]
+    start = time.perf_counter()
+    if not divide_csv_file(input_csv, output_names):
+        raise RuntimeError("divide_csv_file failed")
+    return time.perf_counter() - start, rows, "rows"
+
+
+def _bench_export_jsonl(input_csv, work_dir):
+    from generate_json import export_jsonl
+
+    rows = _count_rows(input_csv)
+    start = time.perf_counter()
+    if export_jsonl(input_csv, os.path.join(work_dir, "messages.jsonl")) is None:
+        raise RuntimeError("export_jsonl failed")
+    return time.perf_counter() - start, rows, "rows"
+
+
+BENCHMARKS = {name: globals()[f"_bench_{name}"] for name in CASES}
+
+
+def run_in_scratch_dir(name, input_csv):
+    """
+    Runs one case in a new scratch directory, which is also the working
+    directory during the run (the transcript cache is created there, so it
+    starts cold), with the scripts' output silenced. The previous working
+    directory is restored. Returns (seconds, items, unit).
+    """
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                return BENCHMARKS[name](input_csv, work_dir)
+        finally:
+            os.chdir(previous_dir)
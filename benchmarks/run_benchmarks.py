@@ -0,0 +1,137 @@
+"""
+Benchmark suite for the transcript pipelines.
+
+Generates a synthetic transcript (see synthetic_transcript.py), then times:
+  - extract_message_content   message_parts decoding, rows/sec
+  - assign_intent             keyword matching on joined conversations, conversations/sec
+  - process_chat_transcript   intent_detection.py end to end (cold cache), rows/sec
+  - per_message_intents       the same with --per-message scoring, rows/sec
+  - divide_csv_file           divide_csv.py hash split into 4 parts, rows/sec
+  - export_jsonl              generate_json.py export, rows/sec
+
+Every run happens in a fresh interpreter, so caches start cold and the peak
+RSS reported for a case is that case's own. Results can be written to JSON
+and compared against a saved baseline; a throughput drop or RSS growth beyond
+the tolerance makes the script exit with status 1, so it can gate CI.
+
+Usage:
+    python benchmarks/run_benchmarks.py --rows 200000 --json results.json
+    python benchmarks/run_benchmarks.py --rows 200000 --baseline results.json --tolerance 0.15
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from benchmark_cases import CASES, run_in_scratch_dir  # noqa: E402
+from run_report import peak_rss_mb  # noqa: E402
+from synthetic_transcript import generate_transcript  # noqa: E402
+
+
+# --- Runner ---
+
+def _run_case_in_child(name, input_csv):
+    """Runs one case in the current (fresh) process; adds the process's peak RSS to its result."""
+    seconds, items, unit = run_in_scratch_dir(name, input_csv)
+    return seconds, items, unit, peak_rss_mb()
+
+
+def run_case(name, input_csv, repeat):
+    """Returns the best of `repeat` runs, each in a new interpreter."""
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            runs.append(pool.submit(_run_case_in_child, name, input_csv).result())
+    seconds, items, unit, _ = min(runs)
+    peaks = [run[3] for run in runs if run[3] is not None] # None where peak RSS is unavailable (Windows)
+    return {
+        "seconds": round(seconds, 4),
+        "items": items,
+        "unit": unit,
+        "throughput": round(items / seconds, 1),
+        "peak_rss_mb": round(max(peaks), 1) if peaks else None,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Returns a list of regression messages for cases slower or larger than the baseline allows."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        if result["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {result['throughput']:,.0f} < baseline {previous['throughput']:,.0f} {result['unit']}/sec"
+            )
+        if None not in (result["peak_rss_mb"], previous.get("peak_rss_mb")) and \
+                result["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak RSS {result['peak_rss_mb']:.1f} MB > baseline {previous['peak_rss_mb']:.1f} MB"
+            )
+    return regressions
+
+
+def main(argv=None):
+    """Command-line entry point; argv defaults to sys.argv[1:]. Returns the exit status."""
+    parser = argparse.ArgumentParser(description="Benchmark the transcript pipelines on synthetic data.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows in the synthetic transcript")
+    parser.add_argument("--input", help="Benchmark this transcript CSV instead of generating one")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES, help="Cases to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is reported")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Allowed throughput drop / RSS growth against the baseline (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        input_csv = os.path.abspath(args.input) if args.input else os.path.join(data_dir, "synthetic.csv")
+        if not args.input:
+            print(f"Generating {args.rows:,} synthetic rows...")
+            generate_transcript(input_csv, args.rows, seed=args.seed, order="shuffled")
+
+        results = {}
+        for name in args.cases:
+            results[name] = run_case(name, input_csv, args.repeat)
+            result = results[name]
+            peak = f"{result['peak_rss_mb']:>9.1f} MB" if result['peak_rss_mb'] is not None else f"{'n/a':>12}"
+            print(f"{name:<26} {result['seconds']:>9.3f} s {result['throughput']:>14,.0f} {result['unit']}/sec"
+                  f" {peak} peak RSS")
+
+    report = {
+        "input": args.input or f"synthetic:{args.rows}:seed={args.seed}",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.json}'.")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
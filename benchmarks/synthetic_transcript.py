@@ -0,0 +1,158 @@
+"""
+Synthetic chat transcript generator for benchmarks.
+
+Writes a CSV with the same columns as the real exports
+(conversation_id, actor_type, message_parts, created_at) at any scale, streaming
+rows to disk so 50M-row files need no more memory than 1k-row ones.
+
+The mix roughly follows production traffic: bot templates (greetings, menus,
+"connect you to an agent") repeat constantly, customers send short free text
+with meter numbers and amounts, plus image and file attachments, and a few
+system events. Conversation lengths are geometrically distributed.
+
+Usage:
+    python benchmarks/synthetic_transcript.py --rows 1000000 --output synthetic.csv
+    python benchmarks/synthetic_transcript.py --rows 50000000 --order shuffled --output big.csv
+"""
+import argparse
+import csv
+import json
+import uuid
+
+import numpy as np
+
+COLUMNS = ['conversation_id', 'actor_type', 'message_parts', 'created_at']
+
+# Share of rows sent by each actor type
+ACTOR_TYPES = ['bot', 'user', 'agent', 'system']
+ACTOR_WEIGHTS = [0.45, 0.40, 0.10, 0.05]
+
+BOT_TEMPLATES = [
+    "Hello! Welcome to our customer support. How can I help you today?",
+    "Please choose an option:\n1. Buy power token\n2. Retrieve power token\n3. Check transaction status\n4. Talk to an agent",
+    "Please enter your meter number.",
+    "Your meter number is valid. Please enter the amount.",
+    "Please hold while I connect you to an agent.",
+    "Is there anything else I can help you with?",
+    "Thank you for contacting us. Goodbye!",
+    "Sorry, I didn't understand that. Reply <b>MENU</b> to see the options.",
+]
+
+CUSTOMER_PHRASES = [
+    "hi", "hello", "good morning", "I didn't get the token", "my meter number is {number}",
+    "I need my token", "transaction failed but money deducted", "please retry", "main menu",
+    "check status of my transaction", "how much do i owe", "thank you", "ok", "I want to speak to a human",
+    "paid {amount} naira", "what's happening with my payment", "the token for my meter", "yes", "no",
+    "pls help me", "recharge code not working",
+]
+
+AGENT_PHRASES = [
+    "Hi, my name is Ada. How may I assist you?",
+    "Kindly share your meter number and transaction reference.",
+    "I have forwarded the token to your phone number.",
+    "Your refund request has been escalated.",
+    "You're welcome, have a great day.",
+]
+
+SYSTEM_EVENTS = ["conversation assigned", "conversation closed", "agent joined"]
+
+ATTACHMENT_FILES = ["receipt.pdf", "statement.pdf", "screenshot.png", "bank_alert.jpg"]
+
+# Rows buffered and shuffled together in --order shuffled mode
+SHUFFLE_WINDOW = 100_000
+
+
+def _text_payload(*contents):
+    return json.dumps([{"text": {"content": content}} for content in contents])
+
+
+# Bot/agent/system payloads are pre-serialized: in real exports they repeat byte for byte
+_BOT_PAYLOADS = [_text_payload(text) for text in BOT_TEMPLATES]
+_AGENT_PAYLOADS = [_text_payload(text) for text in AGENT_PHRASES]
+_SYSTEM_PAYLOADS = [json.dumps([{"event": {"type": event}}]) for event in SYSTEM_EVENTS]
+_IMAGE_PAYLOAD = json.dumps([{"image": {"url": "https://cdn.example.com/media/attachment.jpg"}}])
+_FILE_PAYLOADS = [json.dumps([{"file": {"name": name}}]) for name in ATTACHMENT_FILES]
+
+
+def _customer_payload(rng):
+    kind = rng.random()
+    if kind < 0.12:
+        return _IMAGE_PAYLOAD
+    if kind < 0.20:
+        return _FILE_PAYLOADS[rng.integers(len(_FILE_PAYLOADS))]
+    phrases = [
+        CUSTOMER_PHRASES[i].format(number=rng.integers(10**10, 10**11), amount=rng.integers(5, 500) * 100)
+        for i in rng.integers(len(CUSTOMER_PHRASES), size=rng.integers(1, 4))
+    ]
+    if kind > 0.95: # Occasional text + attachment in one message
+        return json.dumps([{"text": {"content": " ".join(phrases)}}, {"image": {"url": "https://cdn.example.com/x.jpg"}}])
+    return _text_payload(" ".join(phrases))
+
+
+def _payload(actor_type, rng):
+    if actor_type == 'bot':
+        return _BOT_PAYLOADS[rng.integers(len(_BOT_PAYLOADS))]
+    if actor_type == 'agent':
+        return _AGENT_PAYLOADS[rng.integers(len(_AGENT_PAYLOADS))]
+    if actor_type == 'system':
+        return _SYSTEM_PAYLOADS[rng.integers(len(_SYSTEM_PAYLOADS))]
+    return _customer_payload(rng)
+
+
+def iter_transcript_rows(rows, seed=0, mean_messages=12):
+    """
+    Yields `rows` transcript rows as lists, one conversation after another.
+    Conversation IDs are UUIDs whose high bits count up, so in this order the
+    rows are sorted by conversation ID.
+    """
+    rng = np.random.default_rng(seed)
+    written = 0
+    conversation_number = 0
+    timestamp = 1_750_000_000_000
+    while written < rows:
+        length = int(min(rows - written, rng.geometric(1 / mean_messages)))
+        conversation_id = str(uuid.UUID(int=(conversation_number << 64) | int(rng.integers(2**63))))
+        actors = rng.choice(ACTOR_TYPES, size=length, p=ACTOR_WEIGHTS)
+        actors[0] = 'bot' # Every chat opens with the bot greeting
+        for actor_type in actors:
+            timestamp += int(rng.integers(1_000, 60_000))
+            yield [conversation_id, actor_type, _payload(actor_type, rng), timestamp]
+        written += length
+        conversation_number += 1
+
+
+def generate_transcript(output_path, rows, seed=0, order="sorted", mean_messages=12):
+    """
+    Writes a synthetic transcript CSV with `rows` data rows.
+    order is "sorted" (grouped and sorted by conversation ID) or "shuffled"
+    (rows shuffled within windows of SHUFFLE_WINDOW rows, so conversations
+    interleave like in an export ordered by time).
+    """
+    rng = np.random.default_rng(seed + 1)
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        if order == "sorted":
+            writer.writerows(iter_transcript_rows(rows, seed, mean_messages))
+            return
+
+        window = []
+        for row in iter_transcript_rows(rows, seed, mean_messages):
+            window.append(row)
+            if len(window) == SHUFFLE_WINDOW:
+                writer.writerows(window[i] for i in rng.permutation(len(window)))
+                window = []
+        writer.writerows(window[i] for i in rng.permutation(len(window)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic chat transcript CSV.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Number of message rows (1k to 50M)")
+    parser.add_argument("--output", default="synthetic_transcript.csv", help="CSV file to write")
+    parser.add_argument("--order", choices=["sorted", "shuffled"], default="sorted", help="Row order")
+    parser.add_argument("--mean-messages", type=int, default=12, help="Average messages per conversation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_transcript(args.output, args.rows, args.seed, args.order, args.mean_messages)
+    print(f"Wrote {args.rows} rows to '{args.output}'.")
@@ -0,0 +1,46 @@
+"""
+The run_benchmarks.py cases under pytest, on a small synthetic transcript.
+
+With pytest-benchmark installed, every case is timed through its `benchmark`
+fixture, and its own throughput is attached as extra info:
+
+    python -m pytest benchmarks/ --benchmark-only
+
+Without it, each case runs once as a smoke test, so a broken benchmark (or a
+pipeline that fails on the synthetic data) fails the regular test run.
+"""
+import importlib.util
+
+import pytest
+
+from benchmark_cases import CASES, run_in_scratch_dir
+from synthetic_transcript import generate_transcript
+
+# Small enough for the regular test run; use run_benchmarks.py --rows for real numbers
+BENCHMARK_ROWS = 5_000
+
+
+if importlib.util.find_spec("pytest_benchmark") is None:
+    @pytest.fixture
+    def benchmark():
+        """Stand-in for pytest-benchmark's fixture: calls the function once."""
+        def run_once(func, *args, **kwargs):
+            return func(*args, **kwargs)
+        run_once.extra_info = {}
+        return run_once
+
+
+@pytest.fixture(scope="session")
+def input_csv(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("benchmark_data") / "synthetic.csv")
+    generate_transcript(path, BENCHMARK_ROWS, seed=0, order="shuffled")
+    return path
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_benchmark_case(benchmark, input_csv, name):
+    seconds, items, unit = benchmark(run_in_scratch_dir, name, input_csv)
+    benchmark.extra_info.update(items=items, unit=unit, throughput=round(items / seconds, 1))
+    assert seconds > 0
+    assert items > 0
+    assert unit in ("rows", "conversations")
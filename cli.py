@@ -0,0 +1,125 @@
+"""
+Single entry point for the transcript tools.
+
+    python cli.py split          --input export.csv --outputs a.csv b.csv   (divide_csv.py)
+    python cli.py detect-intents --input Ugochukwu.csv --output out.csv     (intent_detection.py)
+    python cli.py export-jsonl   --input export.csv --output messages.jsonl (generate_json.py)
+    python cli.py label          --input Ugochukwu.csv                      (streamlit app)
+    python cli.py batch jobs.txt
+
+Every subcommand takes the same options as the script it runs (see
+`python cli.py <command> --help`). Nothing heavy is imported up front: pandas
+and the pipeline modules are imported only by the subcommand that needs them,
+so `--help`, `label` and argument errors return immediately.
+
+batch runs many jobs in this one process, so interpreter start-up, the pandas
+import and the compiled keyword matcher are paid once instead of once per
+file. The jobs file has one command per line, written like the command line
+without `python cli.py` (shell quoting, `#` comments and blank lines allowed):
+
+    detect-intents --input part_1.csv --output intents_1.csv
+    export-jsonl --input part_1.csv --output part_1.jsonl.gz
+"""
+import argparse
+import importlib
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Subcommand -> (module with a main(argv) function, description)
+COMMANDS = {
+    "split": ("divide_csv", "Split a transcript CSV into per-annotator files"),
+    "detect-intents": ("intent_detection", "Assign keyword-based intents to conversations"),
+    "export-jsonl": ("generate_json", "Export messages as JSONL for labeling"),
+}
+LABEL_APP = os.path.join(SCRIPT_DIR, "label_conversations.py")
+
+
+def run_command(command, argv):
+    """Imports the command's module on first use, runs its main(argv) and returns its exit status."""
+    module_name, _ = COMMANDS[command]
+    return importlib.import_module(module_name).main(argv) or 0
+
+
+def run_label_app(argv):
+    """Starts the Streamlit labeling app; argv is passed through to the app."""
+    return subprocess.call([sys.executable, "-m", "streamlit", "run", LABEL_APP, "--", *argv])
+
+
+def read_jobs(jobs_path):
+    """Returns the jobs of a jobs file ("-" for stdin) as argument lists."""
+    jobs_file = sys.stdin if jobs_path == "-" else open(jobs_path, encoding='utf-8')
+    try:
+        return [argv for argv in map(lambda line: shlex.split(line, comments=True), jobs_file) if argv]
+    finally:
+        if jobs_file is not sys.stdin:
+            jobs_file.close()
+
+
+def run_batch(jobs, stop_on_error=False):
+    """
+    Runs each job (an argument list starting with a subcommand) in this process.
+    A failing job is reported and the batch moves on, unless stop_on_error.
+    Returns the number of failed jobs.
+    """
+    failures = 0
+    batch_start = time.perf_counter()
+    for number, argv in enumerate(jobs, start=1):
+        command, job_args = argv[0], argv[1:]
+        print(f"\n[{number}/{len(jobs)}] {shlex.join(argv)}")
+        if command not in COMMANDS:
+            print(f"Error: '{command}' cannot run in a batch (choose from {', '.join(COMMANDS)}).")
+            failures += 1
+        else:
+            start = time.perf_counter()
+            try:
+                status = run_command(command, job_args)
+                if status:
+                    print(f"Error: job {number} failed (exit status {status}).")
+                    failures += 1
+                else:
+                    print(f"[{number}/{len(jobs)}] done in {time.perf_counter() - start:.2f} s")
+            except SystemExit as e: # argparse errors and --help
+                if e.code not in (None, 0):
+                    failures += 1
+            except Exception as e:
+                print(f"Error: job {number} failed: {e}")
+                failures += 1
+        if failures and stop_on_error:
+            break
+    print(f"\nBatch finished: {len(jobs)} jobs, {failures} failed, {time.perf_counter() - batch_start:.2f} s.")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Chat transcript tools.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(
+            f"  {name:<16}{description}" for name, (_, description) in COMMANDS.items()
+        ) + "\n  label           Start the labeling app (streamlit)"
+            "\n  batch           Run the jobs listed in a file in one process"
+            "\n\nRun `python cli.py <command> --help` for the options of a command.",
+    )
+    parser.add_argument("command", choices=[*COMMANDS, "label", "batch"], metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.command == "label":
+        return run_label_app(args.args)
+    if args.command == "batch":
+        batch_parser = argparse.ArgumentParser(prog="cli.py batch", description="Run many jobs in one process.")
+        batch_parser.add_argument("jobs", help="Jobs file, one command per line ('-' reads stdin)")
+        batch_parser.add_argument("--stop-on-error", action="store_true", help="Stop at the first failed job")
+        batch_args = batch_parser.parse_args(args.args)
+        return 1 if run_batch(read_jobs(batch_args.jobs), batch_args.stop_on_error) else 0
+    return run_command(args.command, args.args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
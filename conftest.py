@@ -0,0 +1,52 @@
+# Lets tests import the top-level scripts (intent_detection, transcript_cache, ...) from the repo root.
+# Also holds the fixtures and helpers the test modules share:
+#   from conftest import read_bytes, write_transcript
+import csv
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Keyword hits, HTML, empty and blank messages, and text that needs escaping in CSV and JSON
+MESSAGES = [
+    "hello", "i need my token", "ok thanks", "meter number is 5", "<b>transaction failed</b>", "", "  ", "retry",
+    "café ünïcode", 'quote " and \\ backslash', "a, b and c", "line\nbreak", "tab\tand  ",
+]
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    """Runs every test in its own directory: the transcript cache is created in the working directory."""
+    monkeypatch.chdir(tmp_path)
+
+
+def write_transcript(path, conversation_ids, sort=False, seed=0):
+    """
+    Writes a transcript export with 1-4 random messages per conversation ID
+    ("" writes rows without an ID). Rows are shuffled, or with sort=True
+    ordered by ID (numeric IDs as numbers, missing IDs last), like an export
+    ordered by conversation.
+    """
+    rng = random.Random(seed)
+    rows = [
+        [conversation_id, rng.choice(["user", "agent", "bot", "system"]),
+         json.dumps([{"text": {"content": rng.choice(MESSAGES)}}])]
+        for conversation_id in conversation_ids for _ in range(rng.randint(1, 4))
+    ]
+    if sort:
+        rows.sort(key=lambda row: (row[0] == "", row[0]))
+    else:
+        rng.shuffle(rows)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["conversation_id", "actor_type", "message_parts"])
+        writer.writerows(rows)
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
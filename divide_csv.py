@@ -1,62 +1,317 @@
 import pandas as pd
 import numpy as np
+import argparse
+import csv
+import hashlib
+import json
+import mmap
 import os
+import sys
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 
-def divide_csv_file(input_filename, output_names):
+# Column that identifies a conversation; a conversation is never split across output files
+CONVERSATION_ID_COL = 'conversation_id'
+
+# Rows read per chunk when streaming the input
+DEFAULT_CHUNKSIZE = 100_000
+
+# Bytes copied per read when splitting by byte range
+COPY_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Written next to the outputs as <input stem>.split_manifest.json: row count,
+# size and SHA-256 of every part. Named after the input so that splits of
+# different files into one directory keep their own manifests.
+MANIFEST_SUFFIX = ".split_manifest.json"
+
+# "hash": output chosen by a stable hash of the conversation ID
+# "balanced": each new conversation goes to the output with the fewest rows so far
+STRATEGIES = ["hash", "balanced"]
+
+
+def _hash_part(conv_id, num_parts):
+    """Stable (run-to-run and process-to-process) output index for a conversation ID."""
+    return zlib.crc32(conv_id.encode("utf-8")) % num_parts
+
+
+def _route_chunk(conv_ids, num_parts, strategy, assignments, loads):
+    """
+    Returns an array with the output index of every row in the chunk.
+    Routing is decided once per distinct conversation ID in the chunk.
+    For the balanced strategy, assignments (conversation ID -> output) and loads
+    (rows per output) carry the state across chunks.
+    """
+    codes, uniques = pd.factorize(conv_ids.fillna(""))
+    if strategy == "hash":
+        unique_parts = np.array([_hash_part(conv_id, num_parts) for conv_id in uniques], dtype=np.int64)
+    else:
+        rows_per_conversation = np.bincount(codes, minlength=len(uniques))
+        unique_parts = np.empty(len(uniques), dtype=np.int64)
+        for i, conv_id in enumerate(uniques): # uniques come in order of first appearance
+            part = assignments.get(conv_id)
+            if part is None:
+                part = int(np.argmin(loads))
+                assignments[conv_id] = part
+            unique_parts[i] = part
+            loads[part] += rows_per_conversation[i]
+    return unique_parts[codes]
+
+
+def _split_streaming(input_filename, output_names, strategy, chunksize):
+    """
+    Streams the input once with pandas and appends every row to the output its
+    conversation is routed to. Each output's SHA-256 is computed from the bytes
+    as they are written. Returns (row_counts, byte_counts, digests).
+    """
+    num_parts = len(output_names)
+    row_counts = [0] * num_parts
+    byte_counts = [0] * num_parts
+    digests = [hashlib.sha256() for _ in range(num_parts)]
+    assignments = {}
+    loads = np.zeros(num_parts, dtype=np.int64)
+
+    with ExitStack() as stack:
+        output_files = [stack.enter_context(open(name, 'wb')) for name in output_names]
+
+        def write(part, data):
+            output_files[part].write(data)
+            digests[part].update(data)
+            byte_counts[part] += len(data)
+
+        # Read everything as text so values are written back exactly as they were read
+        reader = pd.read_csv(input_filename, chunksize=chunksize, dtype=str, keep_default_na=False)
+        for chunk_number, chunk in enumerate(reader):
+            if chunk_number == 0:
+                if CONVERSATION_ID_COL not in chunk.columns:
+                    raise ValueError(f"Missing required column '{CONVERSATION_ID_COL}'")
+                header = chunk.iloc[:0].to_csv(index=False).encode("utf-8")
+                for part in range(num_parts):
+                    write(part, header)
+
+            parts = _route_chunk(chunk[CONVERSATION_ID_COL], num_parts, strategy, assignments, loads)
+            for part, part_df in chunk.groupby(parts):
+                write(part, part_df.to_csv(index=False, header=False).encode("utf-8"))
+                row_counts[part] += len(part_df)
+
+    return row_counts, byte_counts, [digest.hexdigest() for digest in digests]
+
+
+def _iter_records(mm, start):
+    """
+    Yields (record_start, record_end) byte offsets of the CSV records in mm,
+    beginning at offset start. A record only ends at a newline outside quotes,
+    so quoted fields containing line breaks are handled.
+    """
+    size = len(mm)
+    position = start
+    while position < size:
+        record_start = position
+        quotes = 0
+        while True:
+            newline = mm.find(b"\n", position)
+            end = size if newline == -1 else newline + 1
+            quotes += mm[position:end].count(b'"')
+            position = end
+            if quotes % 2 == 0 or end == size:
+                break
+        yield record_start, position
+
+
+def _record_field(record, field_index):
+    """Returns one field of a raw CSV record (bytes), decoding quotes only when needed."""
+    if b'"' not in record:
+        return record.rstrip(b"\r\n").split(b",")[field_index].decode("utf-8")
+    return next(csv.reader([record.decode("utf-8")]))[field_index]
+
+
+def _plan_byte_ranges(input_filename, num_parts, strategy, grouped):
+    """
+    Scans the input once (memory-mapped) and decides which output every run of
+    same-conversation rows goes to, without parsing rows into a DataFrame.
+    With grouped=True the input must keep each conversation in one block; the
+    balanced strategy can then use each conversation's full size.
+
+    Returns (header, ranges, row_counts): the raw header line, and per output a
+    flat array of (start, end) byte offsets to copy plus its row count.
+    Adjacent ranges going to the same output are merged.
     """
-    Divides a CSV file into ten approximately equal parts and saves them
-    with specified names.
+    ranges = [array('q') for _ in range(num_parts)]
+    row_counts = [0] * num_parts
+    loads = np.zeros(num_parts, dtype=np.int64)
+    assignments = {}
+
+    with open(input_filename, 'rb') as input_file, \
+            mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_end = next(_iter_records(mm, 0))[1]
+        header = mm[:header_end]
+        columns = next(csv.reader([header.decode("utf-8-sig")]))
+        if CONVERSATION_ID_COL not in columns:
+            raise ValueError(f"Missing required column '{CONVERSATION_ID_COL}'")
+        conv_index = columns.index(CONVERSATION_ID_COL)
+
+        def route(conv_id, start, end, rows):
+            part = assignments.get(conv_id)
+            if part is None:
+                part = _hash_part(conv_id, num_parts) if strategy == "hash" else int(np.argmin(loads))
+                assignments[conv_id] = part
+            elif grouped:
+                raise ValueError(f"Input is not grouped by '{CONVERSATION_ID_COL}': "
+                                 f"conversation '{conv_id}' appears in more than one block")
+            loads[part] += rows
+            row_counts[part] += rows
+            part_ranges = ranges[part]
+            if part_ranges and part_ranges[-1] == start:
+                part_ranges[-1] = end
+            else:
+                part_ranges.extend((start, end))
+
+        current_id, block_start, block_end, block_rows = None, header_end, header_end, 0
+        for record_start, record_end in _iter_records(mm, header_end):
+            conv_id = _record_field(mm[record_start:record_end], conv_index)
+            if block_rows and conv_id != current_id:
+                route(current_id, block_start, block_end, block_rows)
+                block_start, block_rows = record_start, 0
+            current_id = conv_id
+            block_end = record_end
+            block_rows += 1
+        if block_rows:
+            route(current_id, block_start, block_end, block_rows)
+
+    if not header.endswith(b"\n"):
+        header += b"\n"
+    return header, ranges, row_counts
+
+
+def _copy_byte_ranges(input_filename, output_filename, header, ranges):
+    """
+    Writes header plus the given (start, end) byte ranges of the input to
+    output_filename, copying raw bytes in blocks. Runs in a worker process when
+    several outputs are written in parallel. Returns (byte_count, sha256).
+    """
+    digest = hashlib.sha256()
+    byte_count = 0
+    with open(input_filename, 'rb') as input_file, open(output_filename, 'wb') as output_file:
+        def write(data):
+            nonlocal byte_count
+            output_file.write(data)
+            digest.update(data)
+            byte_count += len(data)
+
+        write(header)
+        for i in range(0, len(ranges), 2):
+            start, end = ranges[i], ranges[i + 1]
+            input_file.seek(start)
+            data = b""
+            while start < end:
+                data = input_file.read(min(COPY_BLOCK_SIZE, end - start))
+                write(data)
+                start += len(data)
+            if not data.endswith(b"\n"): # Last line of a file without a trailing newline
+                write(b"\n")
+    return byte_count, digest.hexdigest()
+
+
+def _split_byte_ranges(input_filename, output_names, strategy, grouped, workers):
+    """
+    Zero-reformat split: plans byte ranges in one pass, then copies them into
+    the outputs, in a process pool when workers > 1.
+    Returns (row_counts, byte_counts, digests).
+    """
+    header, ranges, row_counts = _plan_byte_ranges(input_filename, len(output_names), strategy, grouped)
+    copy_args = [(input_filename, name, header, part_ranges) for name, part_ranges in zip(output_names, ranges)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(output_names))) as executor:
+            results = list(executor.map(_copy_byte_ranges, *zip(*copy_args)))
+    else:
+        results = [_copy_byte_ranges(*args) for args in copy_args]
+    byte_counts, digests = (list(values) for values in zip(*results))
+    return row_counts, byte_counts, digests
+
+
+def _write_manifest(manifest_path, input_filename, strategy, output_names, row_counts, byte_counts, digests):
+    """Records each part's row count, size and SHA-256 so downstream jobs can verify the split."""
+    manifest = {
+        "source": os.path.abspath(input_filename),
+        "source_bytes": os.path.getsize(input_filename),
+        "strategy": strategy,
+        "parts": [
+            {"file": name, "rows": rows, "bytes": byte_count, "sha256": digest}
+            for name, rows, byte_count, digest in zip(output_names, row_counts, byte_counts, digests)
+        ],
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def divide_csv_file(input_filename, output_names, strategy="hash", sorted_input=False, chunksize=DEFAULT_CHUNKSIZE,
+                    workers=1, manifest_path=None):
+    """
+    Divides a chat transcript CSV into one file per output name, keeping every
+    conversation intact in a single file. The input is streamed once, so memory
+    does not grow with the file size.
 
     Args:
         input_filename (str): The path to the input CSV file.
-        output_names (list): A list of 10 strings for the output filenames.
+        output_names (list): Output filenames, one per annotator (any number).
                               E.g., ['Mimi.csv', 'Temitope_Joseph.csv', ...]
+        strategy (str): "hash" routes each conversation by a stable hash of its
+                        ID; "balanced" sends each new conversation to the output
+                        with the fewest rows so far.
+        sorted_input (bool): Set when the rows are grouped by conversation ID.
+                             The file is then split by byte offset (memory-mapped)
+                             and rows are copied without being re-serialized.
+        chunksize (int): Rows per chunk when streaming with pandas.
+        workers (int): With more than one worker, rows are always copied as raw
+                       byte ranges and the output files are written in parallel.
+        manifest_path (str): Where to write the JSON manifest with each part's
+                             row count, size and SHA-256. Defaults to
+                             '<input stem>.split_manifest.json' next to the
+                             first output.
+
+    Returns:
+        bool: True on success, False when the split failed (the error is printed).
     """
     if not os.path.exists(input_filename):
         print(f"Error: Input file '{input_filename}' not found.")
-        return
+        return False
 
-    try:
-        df = pd.read_csv(input_filename)
-        total_rows = len(df)
-        print(f"Successfully loaded '{input_filename}' with {total_rows} rows.")
-    except Exception as e:
-        print(f"Error reading CSV file: {e}")
-        return
-
-    num_parts = len(output_names)
-    if num_parts != 10:
-        print(f"Warning: Expected 10 output names, but received {num_parts}. Proceeding anyway.")
+    if not output_names:
+        print("Error: No output names given.")
+        return False
 
-    # Calculate the number of rows for each part, rounding up for remainders
-    rows_per_part = np.ceil(total_rows / num_parts).astype(int)
+    if strategy not in STRATEGIES:
+        print(f"Error: Unknown strategy '{strategy}'. Choose one of: {', '.join(STRATEGIES)}.")
+        return False
 
-    # Initialize a list to keep track of generated files
-    generated_files = []
+    if manifest_path is None:
+        input_stem = os.path.splitext(os.path.basename(input_filename))[0]
+        manifest_path = os.path.join(os.path.dirname(output_names[0]), input_stem + MANIFEST_SUFFIX)
 
-    # Divide the DataFrame into parts and save them
-    for i in range(num_parts):
-        start_index = i * rows_per_part
-        end_index = min((i + 1) * rows_per_part, total_rows)
-
-        # Handle the case where there might not be enough rows for the last parts
-        if start_index >= total_rows:
-            print(f"No more rows to divide for part {i+1} ({output_names[i]}). Skipping.")
-            continue
-
-        part_df = df.iloc[start_index:end_index]
-        output_filename = output_names[i]
+    byte_mode = sorted_input or workers > 1
+    mode = "byte-range copy" if byte_mode else "streaming"
+    print(f"Splitting '{input_filename}' into {len(output_names)} parts ({strategy} strategy, {mode}, {workers} worker(s))...")
+    try:
+        if byte_mode:
+            row_counts, byte_counts, digests = _split_byte_ranges(
+                input_filename, output_names, strategy, sorted_input, workers
+            )
+        else:
+            row_counts, byte_counts, digests = _split_streaming(input_filename, output_names, strategy, chunksize)
+        _write_manifest(manifest_path, input_filename, strategy, output_names, row_counts, byte_counts, digests)
+    except Exception as e:
+        print(f"Error splitting CSV file: {e}")
+        return False
 
-        try:
-            part_df.to_csv(output_filename, index=False)
-            generated_files.append(output_filename)
-            print(f"Generated '{output_filename}' with {len(part_df)} rows.")
-        except Exception as e:
-            print(f"Error saving '{output_filename}': {e}")
+    for output_filename, row_count in zip(output_names, row_counts):
+        print(f"Generated '{output_filename}' with {row_count} rows.")
 
     print("\nCSV division complete!")
-    print(f"The original file has been divided into {len(generated_files)} parts, and saved as: {', '.join(generated_files)}")
-    print("Each part will contain an approximately equal number of rows. Any 'remainder' rows are distributed among the first few files.")
+    print(f"The original file has been divided into {len(output_names)} parts, and saved as: {', '.join(output_names)}")
+    print("Every conversation is kept whole inside a single file.")
+    print(f"Row counts and checksums written to '{manifest_path}'.")
+    return True
 
 # --- Configuration ---
 # IMPORTANT: Make sure this matches the actual filename of your uploaded CSV
@@ -77,5 +332,23 @@ output_csv_names = [
 ]
 
 # Run the function
+def main(argv=None):
+    """Command-line entry point; argv defaults to sys.argv[1:]. Returns the exit status."""
+    parser = argparse.ArgumentParser(description="Split a chat transcript CSV into per-annotator files, keeping conversations intact.")
+    parser.add_argument("--input", default=input_csv_filename, help="Input transcript CSV")
+    parser.add_argument("--outputs", nargs="+", default=output_csv_names, help="Output filenames, one per annotator")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="hash", help="How conversations are assigned to outputs")
+    parser.add_argument("--sorted", action="store_true", help="Input rows are grouped by conversation; split by byte offset")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk when streaming")
+    parser.add_argument("--workers", type=int, default=1, help="Write output files in parallel with N processes (raw byte-range copy)")
+    parser.add_argument("--manifest", default=None, help=f"Manifest path (default: <input stem>{MANIFEST_SUFFIX} next to the outputs)")
+    args = parser.parse_args(argv)
+
+    succeeded = divide_csv_file(
+        args.input, args.outputs, args.strategy, args.sorted, args.chunksize, args.workers, args.manifest
+    )
+    return 0 if succeeded else 1
+
+
 if __name__ == "__main__":
-    divide_csv_file(input_csv_filename, output_csv_names)
+    sys.exit(main())
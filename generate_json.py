@@ -1,9 +1,31 @@
 import pandas as pd
+import argparse
+import functools
+import gzip
+import importlib.util
 import json
+import os
+import sys
+from contextlib import ExitStack
+
+from pipeline import DEFAULT_WORKERS as DEFAULT_THREADS, run_pipeline
+from transcript_cache import add_message_columns, find_cached_transcript
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 INPUT_CSV = "original_document.csv"
 OUTPUT_JSONL = "messages_for_labeling.jsonl"
 
+# Rows read, parsed and serialized per batch
+DEFAULT_CHUNKSIZE = 100_000
+# Size of the buffered writer in front of the output file
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
+COMPRESSION_CHOICES = ["auto", "none", "gzip", "zstd"]
+
 # Define mappings
 ACTOR_MAP = {
     'user': 'Customer',
@@ -12,37 +34,183 @@ ACTOR_MAP = {
     'system': 'System'
 }
 
-def extract_message_content(parts_str):
+
+def _has_text_ids(parquet_file):
+    """
+    Whether a transcript cache entry stores conversation IDs as text. The cache
+    keeps the type pandas inferred for the whole file, and numeric IDs cannot
+    be turned back into the text they were read from (007 was cached as 7).
+    """
+    import pyarrow as pa
+    id_type = parquet_file.schema_arrow.field('conversation_id').type
+    if pa.types.is_dictionary(id_type):
+        id_type = id_type.value_type
+    return pa.types.is_string(id_type) or pa.types.is_large_string(id_type)
+
+
+def _iter_source_chunks(input_csv_path, chunksize):
+    """
+    Yields frames with 'conversation_id' (as text), 'actor_type' and either
+    'parsed_message_content' or, straight from the CSV, 'message_parts'.
+    A valid transcript cache entry with text IDs is read batch by batch;
+    otherwise the CSV is streamed in chunks, left for _export_chunk to decode.
+    """
+    columns = ['conversation_id', 'actor_type', 'parsed_message_content']
+    # The labeling app caches the same lenient parse, with normalized text columns alongside
+    cache_path = (
+        find_cached_transcript(input_csv_path, flavor="lenient")
+        or find_cached_transcript(input_csv_path, flavor="lenient", normalize=True)
+    )
+    if cache_path:
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(cache_path)
+        if _has_text_ids(parquet_file):
+            print(f"Reading parsed messages from cache '{cache_path}'.")
+            for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+                yield batch.to_pandas()
+            return
+        print("The cached conversation IDs are numbers; reading the CSV to write them as they appear there.")
+
+    # IDs are read as text: with per-chunk type inference, a chunk with a missing
+    # ID would turn its numeric IDs into floats (1 in one chunk, 3.0 in the next)
+    reader = pd.read_csv(
+        input_csv_path, chunksize=chunksize, usecols=['conversation_id', 'actor_type', 'message_parts'],
+        dtype={'conversation_id': str, 'actor_type': "category"},
+    )
+    yield from reader
+
+
+def _encode_unique(values, dumps):
+    """
+    Encodes each distinct value of a Series once with dumps; missing values
+    become null. Returns (codes, encoded values).
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return codes.tolist(), [
+        dumps(None if pd.isna(value) else value) for value in uniques.tolist() # tolist() gives plain Python scalars
+    ]
+
+
+def _serialize_chunk(chunk):
+    """
+    Maps speakers, drops empty and system messages, and returns the chunk's
+    JSON lines as one bytes object. orjson is used when installed; the stdlib
+    fallback writes byte-for-byte the same compact lines.
+    Templates and conversation IDs repeat, so every distinct field value is
+    JSON-encoded once and each line is assembled from the encoded pieces.
+    """
+    messages = chunk['parsed_message_content']
+    speakers = chunk['actor_type'].astype(object).map(ACTOR_MAP).fillna('Unknown')
+
+    # Filter: drop empty/system messages if needed
+    keep = messages.str.strip().astype(bool) & (speakers.str.lower() != 'system')
+    if not keep.any():
+        return b""
+
+    if orjson is not None:
+        dumps, line_format = orjson.dumps, b'{"conversation_id":%b,"speaker":%b,"message":%b}'
+    else:
+        dumps = functools.partial(json.dumps, ensure_ascii=False, separators=(",", ":"))
+        line_format = '{"conversation_id":%s,"speaker":%s,"message":%s}'
+    conv_codes, conv_json = _encode_unique(chunk['conversation_id'][keep], dumps)
+    speaker_codes, speaker_json = _encode_unique(speakers[keep], dumps)
+    message_codes, message_json = _encode_unique(messages[keep], dumps)
+    lines = [
+        line_format % (conv_json[conv_code], speaker_json[speaker_code], message_json[message_code])
+        for conv_code, speaker_code, message_code in zip(conv_codes, speaker_codes, message_codes)
+    ]
+
+    if orjson is not None:
+        return b"\n".join(lines) + b"\n"
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _export_chunk(chunk):
+    """
+    Pipeline worker stage: decodes message_parts if the chunk came from the CSV,
+    then serializes it. Returns (rows read, JSON lines).
+    """
+    if 'message_parts' in chunk.columns:
+        add_message_columns(chunk, "lenient") # Each distinct payload is parsed once per chunk
+    return len(chunk), _serialize_chunk(chunk)
+
+
+def _open_output(stack, path, compression):
+    """
+    Opens path for binary writing behind a large buffer, optionally compressed
+    ("none", "gzip" or "zstd").
+    """
+    if compression == "zstd" and importlib.util.find_spec("zstandard") is None:
+        raise RuntimeError("zstd output needs the 'zstandard' package (pip install zstandard)")
+
+    raw_file = stack.enter_context(open(path, 'wb', buffering=WRITE_BUFFER_SIZE))
+    if compression == "gzip":
+        return stack.enter_context(gzip.GzipFile(fileobj=raw_file, mode='wb', compresslevel=6))
+    if compression == "zstd":
+        import zstandard
+        return stack.enter_context(zstandard.ZstdCompressor().stream_writer(raw_file, closefd=False))
+    return raw_file
+
+
+def export_jsonl(input_csv_path, output_path, chunksize=DEFAULT_CHUNKSIZE, compression="auto", threads=DEFAULT_THREADS):
+    """
+    Streams input_csv_path into a JSONL file of {conversation_id, speaker, message}
+    records, one chunk at a time, so memory stays constant regardless of the
+    input size. compression is "auto" (by extension: .gz / .zst), "none",
+    "gzip" or "zstd". Returns the number of records written, or None on error.
+    The records go to a temporary file next to output_path, renamed over it
+    only once the export is complete, so a failed run leaves no partial output.
+
+    Reading, parsing/serializing (in `threads` worker threads) and writing
+    overlap, see pipeline.py; records are written in input order.
+    """
+    if not os.path.exists(input_csv_path):
+        print(f"Error: Input file '{input_csv_path}' not found.")
+        return None
+
+    if compression == "auto":
+        compression = {".gz": "gzip", ".zst": "zstd"}.get(os.path.splitext(output_path)[1], "none")
+
+    totals = {"rows": 0, "records": 0}
+    tmp_output_path = output_path + ".tmp"
     try:
-        parts = json.loads(parts_str)
-        content_pieces = []
-        for part in parts:
-            if 'text' in part and isinstance(part['text'], dict):
-                content_pieces.append(part['text'].get('content', ''))
-            elif 'image' in part:
-                content_pieces.append("[Image Attached]")
-            elif 'file' in part:
-                content_pieces.append("[File: {}]".format(part['file'].get('name', 'Unknown')))
-        return " ".join(content_pieces).strip()
-    except Exception:
-        return parts_str[:100] if isinstance(parts_str, str) else ""
-
-# Load data
-df = pd.read_csv(INPUT_CSV)
-df['message'] = df['message_parts'].apply(extract_message_content)
-df['speaker'] = df['actor_type'].map(ACTOR_MAP).fillna('Unknown')
-
-# Filter: drop empty/system messages if needed
-df = df[df['message'].str.strip().astype(bool)]
-df = df[df['speaker'].str.lower() != 'system']
-
-# Write as JSONL
-with open(OUTPUT_JSONL, 'w', encoding='utf-8') as f:
-    for _, row in df.iterrows():
-        f.write(json.dumps({
-            "conversation_id": row['conversation_id'],
-            "speaker": row['speaker'],
-            "message": row['message']
-        }, ensure_ascii=False) + '\n')
-
-print(f"Exported to {OUTPUT_JSONL}")
+        with ExitStack() as stack:
+            output_file = _open_output(stack, tmp_output_path, compression)
+
+            def write_payload(result):
+                rows, payload = result
+                output_file.write(payload)
+                totals["rows"] += rows
+                totals["records"] += payload.count(b"\n")
+                print(f"  Read {totals['rows']} rows, exported {totals['records']} messages.")
+
+            run_pipeline(_iter_source_chunks(input_csv_path, chunksize), _export_chunk, write_payload, workers=threads)
+        os.replace(tmp_output_path, output_path)
+    except Exception as e:
+        if os.path.exists(tmp_output_path):
+            os.remove(tmp_output_path)
+        print(f"Error exporting '{input_csv_path}': {e}")
+        return None
+
+    print(f"Exported to {output_path}")
+    return totals["records"]
+
+
+def main(argv=None):
+    """Command-line entry point; argv defaults to sys.argv[1:]. Returns the exit status."""
+    parser = argparse.ArgumentParser(description="Export chat transcript messages as JSONL for labeling.")
+    parser.add_argument("--input", default=INPUT_CSV, help=f"Input transcript CSV (default: {INPUT_CSV})")
+    parser.add_argument("--output", default=OUTPUT_JSONL, help=f"Output JSONL file (default: {OUTPUT_JSONL})")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows read and serialized per batch")
+    parser.add_argument("--compression", choices=COMPRESSION_CHOICES, default="auto",
+                        help="Output compression; 'auto' picks it from the file extension")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS,
+                        help="Worker threads parsing and serializing chunks, next to the reader and writer")
+    args = parser.parse_args(argv)
+
+    records = export_jsonl(args.input, args.output, args.chunksize, args.compression, args.threads)
+    return 1 if records is None else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,23 @@
 import pandas as pd
+import numpy as np
+import argparse
+import csv
+import hashlib
+import heapq
+import importlib.util
 import json
 import os
-import re # Import regex for more flexible keyword matching if needed later
+import re
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import chain, compress, count, islice, repeat
+
+from message_parsing import normalize_text
+from pipeline import DEFAULT_WORKERS as DEFAULT_THREADS, run_pipeline
+from run_report import new_run_report, profiled, stage, write_run_report
+from transcript_cache import DISPLAY_TEXT_COL, MATCH_TEXT_COL, add_message_columns, load_transcript
 
 # --- Configuration Constants ---
 # Input and Output File Paths
@@ -17,8 +33,12 @@ ORIGINAL_MESSAGE_PARTS_COL = 'message_parts' # The JSON string column
 COL_CONVERSATION_ID = 'Conversation ID'
 COL_SPEAKER = 'Speaker'
 COL_MESSAGE = 'Message'
+COL_MESSAGE_INTENT = 'Message Intent' # Per-message mode only
 COL_INTENT = 'Intent'
 
+# Streaming mode: number of input rows read per chunk
+DEFAULT_CHUNKSIZE = 100_000
+
 # Speaker Role Mapping
 SPEAKER_MAPPING = {
     'user': 'Customer',
@@ -95,96 +115,270 @@ INTENT_KEYWORDS = [
 # Default intent if no keywords match
 DEFAULT_INTENT = "General Inquiry / Unclassified"
 
+# Bump when the matching rules change (normalization, tokenization), so
+# incremental runs recompute every conversation
+MATCHER_VERSION = 2
+
 
 # --- Helper Functions ---
 
-def _extract_message_content(message_parts_str):
+# Word tokens. Apostrophes and hyphens inside a word keep it whole ("didn't", "re-send");
+# curly apostrophes are folded to straight ones so "didn’t" matches too.
+_TOKEN = re.compile(r"\w+(?:['\u2019-]\w+)*")
+
+
+def tokenize(text):
+    """Splits normalized text into word tokens (see _TOKEN)."""
+    tokens = _TOKEN.findall(text)
+    if "\u2019" in text:
+        tokens = [token.replace("\u2019", "'") for token in tokens]
+    return tokens
+
+
+def compile_intent_matcher(intent_keywords):
+    """
+    Builds a token matcher from an INTENT_KEYWORDS-style list of tuples.
+    Each keyword is normalized and tokenized like conversation text, and every
+    distinct keyword token is interned as a small integer id (starting at 1).
+    Keywords then only match whole words: "ok" no longer fires inside "token",
+    nor "hi" inside "this".
+
+    Returns a (vocabulary, single_token_keywords, phrase_index) triple:
+      - vocabulary: token -> id, for tokens that occur in some keyword
+      - single_token_keywords: token id -> (priority, intent_name, keyword)
+      - phrase_index: first token id -> [(token ids, (priority, intent_name, keyword)), ...]
+        for multi-word keywords, i.e. an index of the keyword n-grams by their
+        first token, best priority first
+    Matching is then one hash lookup per token of the text, however many
+    keywords there are. When two keywords have the same tokens, the first
+    definition wins, mirroring the original first-match loop.
+    """
+    vocabulary = {}
+    single_token_keywords = {}
+    phrase_keywords = {}
+    for priority, (intent_name, keywords) in enumerate(intent_keywords):
+        for keyword in keywords:
+            token_ids = tuple(
+                vocabulary.setdefault(token, len(vocabulary) + 1) for token in tokenize(normalize_text(keyword))
+            )
+            if len(token_ids) == 1:
+                single_token_keywords.setdefault(token_ids[0], (priority, intent_name, keyword))
+            elif token_ids:
+                phrase_keywords.setdefault(token_ids, (priority, intent_name, keyword))
+
+    phrase_index = {}
+    for token_ids, hit in sorted(phrase_keywords.items(), key=lambda item: item[1]):
+        phrase_index.setdefault(token_ids[0], []).append((token_ids, hit))
+    return vocabulary, single_token_keywords, phrase_index
+
+
+def _compile_batch_tables(vocabulary, single_token_keywords, phrase_index):
     """
-    Parses the 'message_parts' JSON string and extracts text content,
-    or notes about images/files.
-    Handles potential JSON decoding errors and non-string inputs gracefully.
+    Turns a compiled matcher into lookup arrays for scoring many messages at
+    once (see _score_messages). Keywords are ranked by (priority, keyword), the
+    order _best_token_hit uses to break ties. Returns a dict with:
+      - "rank_priority", "rank_keyword": priority and keyword per rank
+      - "single_rank": token id -> rank of its single-token keyword, or -1
+      - "first_token": token id -> whether some keyword starts with it
+      - "radix": one more than the largest token id
+      - "levels": for phrase lengths k = 2, 3, ...: (keys, next_codes, code_rank).
+        Every keyword prefix of length k has a code; keys holds the sorted
+        (code of its first k-1 tokens) * radix + (its k-th token id), next_codes
+        the matching codes and code_rank[code] the rank of the keyword that
+        prefix completes (-1 if none). Prefixes of length 1 use the token id.
     """
-    if pd.isna(message_parts_str) or not isinstance(message_parts_str, str):
-        return "" # Return empty string for NaN or non-string inputs
+    ranked = [((token_id,), hit) for token_id, hit in single_token_keywords.items()]
+    ranked += [entry for entries in phrase_index.values() for entry in entries]
+    ranked.sort(key=lambda entry: (entry[1][0], entry[1][2]))
 
-    message_content = []
-    try:
-        message_parts = json.loads(message_parts_str)
-        if not isinstance(message_parts, list): # Ensure it's a list as expected
-            raise ValueError("message_parts is not a list")
-
-        for part in message_parts:
-            if 'text' in part and isinstance(part.get('text'), dict) and 'content' in part['text']:
-                content = part['text']['content']
-                if content: # Only add if content is not empty
-                    message_content.append(content)
-            elif 'image' in part and isinstance(part.get('image'), dict) and 'url' in part['image']:
-                message_content.append("[Image Attached]")
-            elif 'file' in part and isinstance(part.get('file'), dict) and 'name' in part['file']:
-                message_content.append(f"[File: {part['file']['name']}]")
-    except (json.JSONDecodeError, ValueError) as e:
-        # Fallback if JSON is malformed or structure is unexpected
-        print(f"Warning: Could not parse message_parts JSON: {e}. Raw content: {message_parts_str[:100]}...")
-        return str(message_parts_str) # Return raw string if parsing fails
-    except Exception as e:
-        print(f"An unexpected error occurred during message part extraction: {e}. Raw content: {message_parts_str[:100]}...")
-        return str(message_parts_str)
+    radix = len(vocabulary) + 1
+    single_rank = np.full(radix, -1, dtype=np.int64)
+    first_token = np.zeros(radix, dtype=bool)
+    for rank, (token_ids, _) in enumerate(ranked):
+        first_token[token_ids[0]] = True
+        if len(token_ids) == 1:
+            single_rank[token_ids[0]] = rank
+
+    levels = []
+    prefix_codes = {(token_id,): token_id for token_id in range(radix)}
+    for length in range(2, max((len(token_ids) for token_ids, _ in ranked), default=1) + 1):
+        prefixes = sorted({token_ids[:length] for token_ids, _ in ranked if len(token_ids) >= length})
+        codes = {prefix: code for code, prefix in enumerate(prefixes, start=1)}
+        keys = np.array([prefix_codes[prefix[:-1]] * radix + prefix[-1] for prefix in prefixes], dtype=np.int64)
+        order = np.argsort(keys)
+        code_rank = np.full(len(prefixes) + 1, -1, dtype=np.int64)
+        for rank, (token_ids, _) in enumerate(ranked):
+            if len(token_ids) == length:
+                code_rank[codes[token_ids]] = rank
+        levels.append((keys[order], np.array([codes[prefix] for prefix in prefixes], dtype=np.int64)[order], code_rank))
+        prefix_codes = codes
+
+    return {
+        "rank_priority": np.array([hit[0] for _, hit in ranked], dtype=np.int64),
+        "rank_keyword": [hit[2] for _, hit in ranked],
+        "single_rank": single_rank,
+        "first_token": first_token,
+        "radix": radix,
+        "levels": levels,
+    }
+
+
+# Compiled once at import time from INTENT_KEYWORDS
+_VOCABULARY, _SINGLE_TOKEN_KEYWORDS, _PHRASE_INDEX = compile_intent_matcher(INTENT_KEYWORDS)
+_BATCH_TABLES = _compile_batch_tables(_VOCABULARY, _SINGLE_TOKEN_KEYWORDS, _PHRASE_INDEX)
+
+
+def _token_ids(match_text):
+    """
+    Interned token ids of normalized text, one per token; tokens that appear in
+    no keyword are None. The ids of a conversation are the concatenation of its
+    messages' ids, since messages are joined with a space.
+    """
+    return list(map(_VOCABULARY.get, tokenize(match_text)))
+
+
+def _iter_token_hits(token_ids):
+    """
+    Yields (token_position, (priority, intent_name, keyword)) for every keyword
+    occurrence in a token id list, in text order. Only positions holding a
+    keyword token are visited (compress() skips the rest at C speed).
+    """
+    for position in compress(count(), token_ids):
+        token_id = token_ids[position]
+        hit = _SINGLE_TOKEN_KEYWORDS.get(token_id)
+        if hit is not None:
+            yield position, hit
+        for phrase_ids, hit in _PHRASE_INDEX.get(token_id, ()):
+            if tuple(token_ids[position:position + len(phrase_ids)]) == phrase_ids:
+                yield position, hit
+
+
+def _best_token_hit(token_ids):
+    """
+    Returns the winning (token_position, (priority, intent_name, keyword)) hit:
+    the leftmost hit of the intent that comes first in INTENT_KEYWORDS. Returns
+    None when nothing matches.
+    """
+    best = None
+    for position, hit in _iter_token_hits(token_ids):
+        if best is None or hit[0] < best[1][0] or (hit[0] == best[1][0] and position == best[0] and hit[2] < best[1][2]):
+            best = (position, hit)
+            if hit[0] == 0:
+                break # Nothing can beat the leftmost hit of the first intent
+    return best
 
-    return " ".join(message_content).strip()
+
+def _token_offset(match_text, position):
+    """Character offset of the token at `position` in normalized text."""
+    return next(islice(_TOKEN.finditer(match_text), position, None)).start()
+
+
+def find_intent_hits(all_conversation_text):
+    """
+    Tokenizes the conversation text once and returns every keyword hit as a
+    list of (intent_name, keyword, start_offset) tuples, in text order.
+    Offsets refer to positions in the normalized text (see normalize_text).
+    """
+    match_text = normalize_text(all_conversation_text)
+    hits = list(_iter_token_hits(_token_ids(match_text)))
+    if not hits:
+        return []
+    offsets = [match.start() for match in _TOKEN.finditer(match_text)]
+    return [(intent_name, keyword, offsets[position]) for position, (_, intent_name, keyword) in hits]
+
+
+def match_intent(all_conversation_text):
+    """
+    Returns the winning (intent_name, keyword, start_offset) for a conversation.
+    The winner is the hit whose intent comes first in INTENT_KEYWORDS (the
+    leftmost one if that intent matches several times).
+    The text is normalized first: HTML tags stripped, entities unescaped,
+    whitespace collapsed and lowercased. It is then tokenized once and matched
+    word by word, so the cost is linear in the number of tokens.
+    Returns (DEFAULT_INTENT, None, None) when nothing matches.
+    """
+    match_text = normalize_text(all_conversation_text)
+    best = _best_token_hit(_token_ids(match_text))
+    if best is None:
+        return DEFAULT_INTENT, None, None
+    position, (_, intent_name, keyword) = best
+    return intent_name, keyword, _token_offset(match_text, position)
 
 
 def assign_intent(all_conversation_text):
     """
     Assigns an intent to a conversation based on predefined keywords.
     Rules are applied in the order defined in INTENT_KEYWORDS (most specific first).
+    Keywords match whole words only, in a single pass over the tokens (see compile_intent_matcher).
     """
-    all_text_lower = all_conversation_text.lower()
+    return match_intent(all_conversation_text)[0]
 
-    for intent_name, keywords in INTENT_KEYWORDS: # Iterate through the list of tuples
-        for keyword in keywords:
-            if keyword in all_text_lower:
-                return intent_name
-    return DEFAULT_INTENT
 
+def _is_required_column(col):
+    """usecols filter: only the three columns the pipeline needs are ever loaded."""
+    return col in (ORIGINAL_CONVERSATION_ID_COL, ORIGINAL_ACTOR_TYPE_COL, ORIGINAL_MESSAGE_PARTS_COL)
 
-# --- Main Processing Function ---
 
-def process_chat_transcript(input_csv_path, output_csv_path):
+def _add_parsed_columns(df, report=None):
     """
-    Reads the chat transcript CSV, processes it to extract messages and assign intents
-    per conversation, and writes the structured data to a new CSV.
+    Replaces message_parts with the parsed message text and its normalized
+    matching text, in one stage (see transcript_cache.add_message_columns).
     """
-    if not os.path.exists(input_csv_path):
-        print(f"Error: Input file not found at {input_csv_path}. Please ensure it's in the same directory.")
-        return
+    add_message_columns(df, "strict", ORIGINAL_MESSAGE_PARTS_COL, normalize=True, report=report)
+    del df[DISPLAY_TEXT_COL] # The output keeps the parsed text as-is
 
-    try:
-        df = pd.read_csv(input_csv_path)
-        print(f"Successfully loaded '{input_csv_path}' with {len(df)} rows.")
-    except Exception as e:
-        print(f"Error reading input CSV file: {e}")
-        return
 
-    # Validate essential columns
+def _conversation_id_dtype(input_csv_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    The type pd.read_csv infers for the conversation ID column of the whole
+    file, as process_chat_transcript loads it: "int64" when every ID is an
+    integer, "float64" when some are missing or fractional, str otherwise.
+    Found by reading only that column, chunk by chunk, so the chunked paths can
+    read, sort and print IDs exactly like the in-memory path (numeric IDs sort
+    as 1, 2, 10 rather than 1, 10, 2).
+    """
+    kinds = set()
+    for chunk in pd.read_csv(input_csv_path, usecols=[ORIGINAL_CONVERSATION_ID_COL], chunksize=chunksize):
+        kinds.add(chunk[ORIGINAL_CONVERSATION_ID_COL].dtype.kind)
+    if kinds == {"i"}:
+        return "int64"
+    if kinds and kinds <= {"i", "f"}:
+        return "float64"
+    return str
+
+
+def _conversation_id_key(id_dtype):
+    """Sort key for conversation IDs read back as text from intermediate CSV files."""
+    return {"int64": int, "float64": float}.get(id_dtype, str)
+
+
+def _has_required_columns(columns):
+    """
+    Checks that the input CSV has the columns configured above.
+    Prints a helpful error and returns False when any are missing.
+    """
     required_cols = [
         ORIGINAL_CONVERSATION_ID_COL,
         ORIGINAL_ACTOR_TYPE_COL,
         ORIGINAL_MESSAGE_PARTS_COL
     ]
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    missing_cols = [col for col in required_cols if col not in columns]
     if missing_cols:
         print(f"Error: Missing required columns in input CSV: {', '.join(missing_cols)}")
         print(f"Please update '{os.path.basename(__file__)}' with correct column names in the Configuration Constants section.")
-        return
+        return False
+    return True
 
-    # Extract message content
-    print("Extracting message content from 'message_parts' column...")
-    df['parsed_message_content'] = df[ORIGINAL_MESSAGE_PARTS_COL].apply(_extract_message_content)
 
+def _build_output_frame_rows(df):
+    """
+    Original row-by-row engine: loops over each conversation group, assigns its
+    intent and appends one dict per message. Kept as a reference for the
+    columnar engine, which must produce identical output.
+    """
     processed_data_rows = []
-    conversations_grouped = df.groupby(ORIGINAL_CONVERSATION_ID_COL)
+    conversations_grouped = df.groupby(ORIGINAL_CONVERSATION_ID_COL, observed=True)
 
-    print("Processing conversations and assigning intents...")
     total_conversations = len(conversations_grouped)
     processed_count = 0
 
@@ -212,12 +406,351 @@ def process_chat_transcript(input_csv_path, output_csv_path):
         if processed_count % 100 == 0 or processed_count == total_conversations:
             print(f"  Processed {processed_count}/{total_conversations} conversations.")
 
-    # Create the final DataFrame
-    output_df = pd.DataFrame(processed_data_rows)
+    return pd.DataFrame(processed_data_rows)
+
+
+def _map_speakers(actor_types):
+    """
+    Vectorized SPEAKER_MAPPING lookup that keeps unmapped roles (and missing
+    values) as they are. The mapping is applied once per distinct actor type
+    and the result is categorical, so no per-row strings are created.
+    """
+    codes, uniques = pd.factorize(actor_types)
+    speaker_codes, speakers = pd.factorize(pd.Index([SPEAKER_MAPPING.get(actor, actor) for actor in uniques], dtype=object))
+    row_codes = np.where(codes < 0, -1, speaker_codes[codes]) if len(uniques) else codes
+    return pd.Series(pd.Categorical.from_codes(row_codes, speakers), index=actor_types.index)
+
+
+def _count_keyword_hits(token_id_lists, weights=None):
+    """
+    Counts every keyword occurrence in token id lists (see _token_ids), not
+    only the winning ones. weights, when given, is how many times each list
+    counts (e.g. how often a distinct message appears).
+    Returns {intent_name: {keyword: hits}}.
+    """
+    keyword_hits = {}
+    for token_ids, weight in zip(token_id_lists, weights if weights is not None else repeat(1)):
+        for _, (_, intent_name, keyword) in _iter_token_hits(token_ids):
+            intent_keywords = keyword_hits.setdefault(intent_name, {})
+            intent_keywords[keyword] = intent_keywords.get(keyword, 0) + weight
+    return keyword_hits
+
+
+def _intent_summary(matches, keyword_hits):
+    """
+    Summarizes a run: conversations per intent (from the winning
+    (intent_name, keyword) match of every conversation), every keyword hit
+    within each intent (see _count_keyword_hits), and the share of
+    conversations that fell back to DEFAULT_INTENT.
+    """
+    intent_counts = {}
+    for intent_name, _ in matches:
+        intent_counts[intent_name] = intent_counts.get(intent_name, 0) + 1
+    total = len(matches)
+    return {
+        "conversations": total,
+        "intent_counts": dict(sorted(intent_counts.items(), key=lambda item: -item[1])),
+        "keyword_hits": {
+            intent_name: dict(sorted(hits.items(), key=lambda item: -item[1]))
+            for intent_name, hits in keyword_hits.items()
+        },
+        "default_fallback_rate": round(intent_counts.get(DEFAULT_INTENT, 0) / total, 4) if total else 0.0,
+    }
+
+
+def _message_token_ids(match_texts):
+    """
+    Token ids (see _token_ids) for a Series of normalized messages. Each distinct
+    message is tokenized once, so repeated bot templates cost one tokenization.
+    Returns (row_codes, unique_token_ids): row i has unique_token_ids[row_codes[i]].
+    """
+    row_codes, unique_texts = pd.factorize(match_texts.fillna(""))
+    return row_codes.tolist(), [_token_ids(text) for text in unique_texts]
+
+
+def _score_messages(match_texts):
+    """
+    Vectorized per-message scoring of a Series of normalized messages.
+    Distinct messages are tokenized in one .str pass and exploded into a flat
+    array of token ids. Single-token keywords are found with one array lookup;
+    phrases by walking the keyword prefix tables one token at a time (each step
+    shifts the surviving start positions by one token and looks up
+    prefix code * radix + next token with searchsorted), so the work is one
+    vectorized step per phrase length rather than one Python call per message.
+    Returns the keyword rank (see _compile_batch_tables) of each row's winning
+    hit, or -1 when the message matches no keyword.
+    """
+    tables = _BATCH_TABLES
+    row_codes, unique_texts = pd.factorize(match_texts.fillna(""))
+    tokens = (
+        pd.Series(unique_texts, dtype=object)
+        .str.replace("\u2019", "'", regex=False)
+        .str.findall(_TOKEN)
+        .explode()
+    )
+    message_of = tokens.index.to_numpy()
+    token_ids = tokens.map(_VOCABULARY).fillna(0).to_numpy(dtype=np.int64)
+
+    single_ranks = tables["single_rank"][token_ids]
+    hit_positions = [np.flatnonzero(single_ranks >= 0)]
+    hit_ranks = [single_ranks[hit_positions[0]]]
+
+    starts = np.flatnonzero(tables["first_token"][token_ids])
+    codes = token_ids[starts]
+    for length, (keys, next_codes, code_rank) in enumerate(tables["levels"], start=2):
+        ends = starts + (length - 1)
+        in_message = ends < len(token_ids)
+        in_message[in_message] = message_of[ends[in_message]] == message_of[starts[in_message]]
+        starts, codes, ends = starts[in_message], codes[in_message], ends[in_message]
+        lookup = codes * tables["radix"] + token_ids[ends]
+        slots = np.minimum(np.searchsorted(keys, lookup), len(keys) - 1)
+        found = keys[slots] == lookup
+        starts, codes = starts[found], next_codes[slots[found]]
+        ranks = code_rank[codes]
+        hit_positions.append(starts[ranks >= 0])
+        hit_ranks.append(ranks[ranks >= 0])
+        if not len(starts):
+            break
+
+    positions = np.concatenate(hit_positions)
+    ranks = np.concatenate(hit_ranks)
+    messages = message_of[positions]
+    # Per message: best priority, then leftmost, then keyword order (= rank order)
+    order = np.lexsort((ranks, positions, tables["rank_priority"][ranks], messages))
+    first_hits = order[np.unique(messages[order], return_index=True)[1]]
+    unique_ranks = np.full(len(unique_texts), -1, dtype=np.int64)
+    unique_ranks[messages[first_hits]] = ranks[first_hits]
+    return unique_ranks[row_codes]
+
+
+def _empty_output_frame(per_message=False):
+    """The header-only frame the engines return when no conversation is left."""
+    columns = [COL_CONVERSATION_ID, COL_SPEAKER, COL_MESSAGE]
+    columns += [COL_MESSAGE_INTENT, COL_INTENT] if per_message else [COL_INTENT]
+    return pd.DataFrame(columns=columns)
+
+
+def _sort_conversations(df):
+    """
+    Stably sorts rows by conversation ID, which reproduces groupby's sorted
+    group order while keeping the original message order inside each
+    conversation. Returns (sorted_df, conversation_numbers, starts): the
+    conversation number of each row, in output order, and the first row of
+    each conversation.
+    """
+    df = df.sort_values(ORIGINAL_CONVERSATION_ID_COL, kind="stable")
+    conversation_numbers, _ = pd.factorize(df[ORIGINAL_CONVERSATION_ID_COL])
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(conversation_numbers)) + 1])
+    return df, conversation_numbers, starts
+
+
+def _build_output_frame_columnar(df, report=None):
+    """
+    Columnar engine: tokenizes each distinct normalized message ('match_text')
+    once, concatenates the token ids of each conversation's messages, assigns
+    intents once per conversation and broadcasts them back to the messages by
+    conversation code. No per-row Python objects are built for the output.
+    Produces the same frame (row order, columns and values) as the rows engine.
+    When a run report is given, its stages are timed and an intent summary
+    (see _intent_summary) is added to it.
+    """
+    # groupby() silently drops rows without a conversation ID; do the same
+    df = df[df[ORIGINAL_CONVERSATION_ID_COL].notna()]
+    if df.empty:
+        return _empty_output_frame()
+
+    with stage(report, "group_conversations") as s:
+        df, conversation_numbers, starts = _sort_conversations(df)
+        bounds = [*starts.tolist(), len(df)]
+        s["rows"] = len(df)
+        s["conversations"] = len(starts)
+
+    with stage(report, "tokenize") as s:
+        row_codes, unique_token_ids = _message_token_ids(df[MATCH_TEXT_COL])
+        s["rows"] = len(df)
+        s["unique_messages"] = len(unique_token_ids)
+
+    with stage(report, "match_intents") as s:
+        matches = []
+        for start, end in zip(bounds, bounds[1:]):
+            token_ids = list(chain.from_iterable(map(unique_token_ids.__getitem__, row_codes[start:end])))
+            best = _best_token_hit(token_ids)
+            matches.append((best[1][1], best[1][2]) if best else (DEFAULT_INTENT, None))
+        conversation_intents = pd.Categorical([intent_name for intent_name, _ in matches])
+        s["rows"] = len(df)
+        s["conversations"] = len(matches)
+    if report is not None:
+        with stage(report, "count_keyword_hits") as s:
+            keyword_hits = _count_keyword_hits(
+                list(chain.from_iterable(map(unique_token_ids.__getitem__, row_codes[start:end])))
+                for start, end in zip(bounds, bounds[1:])
+            )
+            s["rows"] = len(df)
+        report["intents"] = _intent_summary(matches, keyword_hits)
+
+    with stage(report, "build_output") as s:
+        output_df = pd.DataFrame({
+            COL_CONVERSATION_ID: df[ORIGINAL_CONVERSATION_ID_COL].reset_index(drop=True),
+            COL_SPEAKER: _map_speakers(df[ORIGINAL_ACTOR_TYPE_COL]).reset_index(drop=True),
+            COL_MESSAGE: df['parsed_message_content'].to_numpy(),
+            # Intent and Speaker are categoricals: one small code per row instead of a repeated string
+            COL_INTENT: pd.Categorical.from_codes(
+                conversation_intents.codes[conversation_numbers], conversation_intents.categories
+            ),
+        })
+        s["rows"] = len(output_df)
+    return output_df
+
+
+def _build_output_frame_per_message(df, report=None):
+    """
+    Per-message engine: every message gets its own top intent ('Message Intent',
+    from the keywords in that message alone) and the conversation roll-up
+    ('Intent': the best message intent of the conversation, i.e. the intent
+    that comes first in INTENT_KEYWORDS, taken from its earliest message).
+    Scoring is fully vectorized (see _score_messages). Rows are ordered like
+    the conversation-level engines.
+
+    The roll-up only differs from the conversation-level intent when a phrase
+    keyword spans two messages, which per-message scoring never matches.
+    """
+    df = df[df[ORIGINAL_CONVERSATION_ID_COL].notna()]
+    if df.empty:
+        return _empty_output_frame(per_message=True)
+
+    with stage(report, "group_conversations") as s:
+        df, conversation_numbers, starts = _sort_conversations(df)
+        s["rows"] = len(df)
+        s["conversations"] = len(starts)
+
+    with stage(report, "score_messages") as s:
+        row_ranks = _score_messages(df[MATCH_TEXT_COL])
+        s["rows"] = len(df)
+
+    # Intent index per row: the keyword's priority, or one past the last intent for DEFAULT_INTENT
+    default_index = len(INTENT_KEYWORDS)
+    row_intents = np.where(row_ranks >= 0, _BATCH_TABLES["rank_priority"][row_ranks], default_index)
+
+    with stage(report, "roll_up") as s:
+        # Lowest intent index per conversation, earliest row first on ties
+        row_count = len(df)
+        best_rows = np.minimum.reduceat(row_intents * row_count + np.arange(row_count), starts) % row_count
+        conversation_intents = row_intents[best_rows]
+        s["rows"] = row_count
+        s["conversations"] = len(starts)
+
+    if report is not None:
+        intent_names = [intent_name for intent_name, _ in INTENT_KEYWORDS] + [DEFAULT_INTENT]
+        rank_keyword = _BATCH_TABLES["rank_keyword"]
+        best_ranks = row_ranks[best_rows]
+        with stage(report, "count_keyword_hits") as s:
+            # Hits inside each message, like the scoring; each distinct message is counted once per occurrence
+            row_codes, unique_token_ids = _message_token_ids(df[MATCH_TEXT_COL])
+            keyword_hits = _count_keyword_hits(
+                unique_token_ids, np.bincount(row_codes, minlength=len(unique_token_ids)).tolist()
+            )
+            s["rows"] = len(df)
+        report["intents"] = _intent_summary([
+            (intent_names[intent], rank_keyword[rank] if rank >= 0 else None)
+            for intent, rank in zip(conversation_intents.tolist(), best_ranks.tolist())
+        ], keyword_hits)
+        message_counts = np.bincount(row_intents, minlength=default_index + 1)
+        report["message_intents"] = {
+            intent_names[intent]: int(count) for intent, count in enumerate(message_counts) if count
+        }
+
+    with stage(report, "build_output") as s:
+        intent_codes, intent_categories = pd.factorize(
+            pd.Index([intent_name for intent_name, _ in INTENT_KEYWORDS] + [DEFAULT_INTENT], dtype=object)
+        )
+        output_df = pd.DataFrame({
+            COL_CONVERSATION_ID: df[ORIGINAL_CONVERSATION_ID_COL].reset_index(drop=True),
+            COL_SPEAKER: _map_speakers(df[ORIGINAL_ACTOR_TYPE_COL]).reset_index(drop=True),
+            COL_MESSAGE: df['parsed_message_content'].to_numpy(),
+            COL_MESSAGE_INTENT: pd.Categorical.from_codes(intent_codes[row_intents], intent_categories),
+            COL_INTENT: pd.Categorical.from_codes(
+                intent_codes[conversation_intents[conversation_numbers]], intent_categories
+            ),
+        })
+        s["rows"] = len(output_df)
+    return output_df
+
+
+# --- Main Processing Function ---
+
+def process_chat_transcript(input_csv_path, output_csv_path, engine="columnar", report_path=None, per_message=False):
+    """
+    Reads the chat transcript CSV, processes it to extract messages and assign intents
+    per conversation, and writes the structured data to a new CSV.
+
+    engine selects how the output rows are built: "columnar" (default) uses
+    vectorized pandas operations, "rows" is the original per-row loop.
+    per_message adds a 'Message Intent' column with each message's own intent
+    and rolls the conversation intent up from those (see
+    _build_output_frame_per_message); engine is then ignored.
+
+    With report_path, a JSON run report is written there: wall time, rows/sec
+    and memory change per stage (hashing, CSV read, parsing, grouping,
+    matching, output build, CSV write), plus per-intent keyword hits and the
+    default-intent fallback rate (columnar engine).
+
+    Returns True on success, False when the input is missing or unreadable
+    (the error is printed).
+    """
+    if not os.path.exists(input_csv_path):
+        print(f"Error: Input file not found at {input_csv_path}. Please ensure it's in the same directory.")
+        return False
+
+    report = None
+    if report_path:
+        report = new_run_report(
+            "intent_detection", input=input_csv_path, output=output_csv_path,
+            engine="per_message" if per_message else engine,
+        )
+
+    # Validate essential columns from the header; message_parts is dropped once parsed
+    try:
+        if not _has_required_columns(pd.read_csv(input_csv_path, nrows=0).columns):
+            return False
+    except Exception as e:
+        print(f"Error reading input CSV file: {e}")
+        return False
+
+    try:
+        # Parsed message content comes from the transcript cache when it is valid
+        print("Loading transcript and extracting message content from 'message_parts' column...")
+        df = load_transcript(
+            input_csv_path,
+            flavor="strict",
+            conversation_id_col=ORIGINAL_CONVERSATION_ID_COL,
+            actor_type_col=ORIGINAL_ACTOR_TYPE_COL,
+            message_parts_col=ORIGINAL_MESSAGE_PARTS_COL,
+            normalize=True,
+            report=report,
+        )
+        del df[DISPLAY_TEXT_COL] # Only the parsed and matching text are used here
+        print(f"Successfully loaded '{input_csv_path}' with {len(df)} rows.")
+    except Exception as e:
+        print(f"Error reading input CSV file: {e}")
+        return False
+
+    print("Processing conversations and assigning intents...")
+    if per_message:
+        output_df = _build_output_frame_per_message(df, report)
+        print(f"  Processed {df[ORIGINAL_CONVERSATION_ID_COL].nunique()} conversations.")
+    elif engine == "rows":
+        with stage(report, "build_output") as s:
+            output_df = _build_output_frame_rows(df)
+            s["rows"] = len(output_df)
+    else:
+        output_df = _build_output_frame_columnar(df, report)
+        print(f"  Processed {df[ORIGINAL_CONVERSATION_ID_COL].nunique()} conversations.")
 
     # Save the processed data to a new CSV
     try:
-        output_df.to_csv(output_csv_path, index=False)
+        with stage(report, "write_csv") as s:
+            output_df.to_csv(output_csv_path, index=False)
+            s["rows"] = len(output_df)
         print(f"\nProcessing complete! Structured data saved to '{output_csv_path}'")
         print(f"Total rows in output: {len(output_df)}")
         print("Columns in output file:")
@@ -227,7 +760,548 @@ def process_chat_transcript(input_csv_path, output_csv_path):
         print("For more advanced intent classification, consider fine-tuning an LLM.")
     except Exception as e:
         print(f"Error saving the processed CSV file: {e}")
+        return False
+
+    if report is not None:
+        report["rows"] = len(df)
+        write_run_report(report, report_path)
+        print(f"Run report saved to '{report_path}'.")
+    return True
+
+
+def _external_sort_csv(input_csv_path, sorted_csv_path, chunksize, tmp_dir, id_dtype=str):
+    """
+    Sorts a CSV that may not fit in memory by conversation ID, compared as
+    id_dtype (see _conversation_id_dtype).
+    Each chunk is stably sorted and written to a temporary run file, then the
+    runs are k-way merged row by row into sorted_csv_path. heapq.merge is stable,
+    so messages keep their original order inside each conversation.
+    Rows without a conversation ID are dropped (they never reach the output).
+    Returns True on success.
+    """
+    run_paths = []
+    try:
+        # Other columns are read as text so values round-trip through the run files unchanged
+        chunks = pd.read_csv(
+            input_csv_path, chunksize=chunksize, usecols=_is_required_column,
+            dtype={ORIGINAL_CONVERSATION_ID_COL: id_dtype, ORIGINAL_ACTOR_TYPE_COL: str, ORIGINAL_MESSAGE_PARTS_COL: str},
+        )
+        for chunk_number, chunk in enumerate(chunks):
+            if chunk_number == 0 and not _has_required_columns(chunk.columns):
+                return False
+            chunk = chunk[chunk[ORIGINAL_CONVERSATION_ID_COL].notna()]
+            chunk = chunk.sort_values(ORIGINAL_CONVERSATION_ID_COL, kind="stable")
+            run_path = os.path.join(tmp_dir, f"run_{chunk_number:05d}.csv")
+            chunk.to_csv(run_path, index=False)
+            run_paths.append(run_path)
+    except Exception as e:
+        print(f"Error reading input CSV file: {e}")
+        return False
+
+    print(f"  Wrote {len(run_paths)} sorted runs, merging...")
+    run_files = [open(path, newline='', encoding='utf-8') for path in run_paths]
+    try:
+        readers = [csv.reader(run_file) for run_file in run_files]
+        header = [next(reader) for reader in readers][0] if readers else []
+        conv_index = header.index(ORIGINAL_CONVERSATION_ID_COL) if header else 0
+        id_key = _conversation_id_key(id_dtype)
+        with open(sorted_csv_path, 'w', newline='', encoding='utf-8') as sorted_file:
+            writer = csv.writer(sorted_file, lineterminator='\n')
+            writer.writerow(header)
+            writer.writerows(heapq.merge(*readers, key=lambda row: id_key(row[conv_index])))
+    finally:
+        for run_file in run_files:
+            run_file.close()
+    return True
+
+
+def _build_output_frame(df, per_message=False):
+    """The engine used by the streaming, parallel and incremental paths."""
+    return _build_output_frame_per_message(df) if per_message else _build_output_frame_columnar(df)
+
+
+def _label_conversations(df, per_message=False):
+    """
+    Pipeline worker stage: parses and labels a frame of complete conversations.
+    Returns its output rows.
+    """
+    df = df.copy()
+    _add_parsed_columns(df)
+    return _build_output_frame(df, per_message)
+
+
+def _iter_complete_conversations(chunks, progress):
+    """
+    Re-cuts the chunks of an input sorted by conversation ID at conversation
+    boundaries: yields frames holding only complete conversations, carrying the
+    last conversation of each chunk into the next one in case it continues
+    there. progress["rows_in"] counts the rows read; progress["sorted"] is set
+    to False, and iteration stops, when the conversation IDs go backwards.
+    """
+    carry = None # Trailing conversation that may continue in the next chunk
+    for chunk in chunks:
+        progress["rows_in"] += len(chunk)
+        chunk = chunk[chunk[ORIGINAL_CONVERSATION_ID_COL].notna()]
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+
+        conv_ids = chunk[ORIGINAL_CONVERSATION_ID_COL]
+        if not conv_ids.is_monotonic_increasing:
+            progress["sorted"] = False
+            return
+
+        is_last_conversation = conv_ids == conv_ids.iloc[-1]
+        carry = chunk[is_last_conversation]
+        if not is_last_conversation.all():
+            yield chunk[~is_last_conversation]
+    if carry is not None:
+        yield carry
+
+
+def process_chat_transcript_streaming(input_csv_path, output_csv_path, chunksize=DEFAULT_CHUNKSIZE, assume_sorted=True,
+                                      per_message=False, threads=DEFAULT_THREADS, id_dtype=None):
+    """
+    Streaming variant of process_chat_transcript for files larger than RAM.
+    Reads the input in chunks of `chunksize` rows and appends each finished
+    conversation to the output CSV as soon as it is complete, so peak memory is
+    bounded by a few chunks plus the largest conversation.
+
+    Reading, labelling and writing overlap (see pipeline.py): a reader thread
+    cuts the input into frames of complete conversations, `threads` worker
+    threads parse and label them, and the output is written in input order.
+
+    With assume_sorted=True the input must be sorted by conversation ID; the
+    last conversation of each chunk is carried into the next chunk in case it
+    continues there. The output is then identical to process_chat_transcript.
+    With assume_sorted=False the input is first sorted on disk (external merge
+    sort in a temporary directory next to the output file).
+
+    Conversation IDs are read with the type process_chat_transcript would infer
+    (id_dtype, found with one extra pass over the ID column when not given), so
+    numeric IDs are sorted, checked and written as numbers.
+    Returns True on success; on failure no output file is left behind.
+    """
+    if not os.path.exists(input_csv_path):
+        print(f"Error: Input file not found at {input_csv_path}. Please ensure it's in the same directory.")
+        return False
+
+    try:
+        if not _has_required_columns(pd.read_csv(input_csv_path, nrows=0).columns):
+            return False
+        if id_dtype is None:
+            id_dtype = _conversation_id_dtype(input_csv_path, chunksize)
+    except Exception as e:
+        print(f"Error reading input CSV file: {e}")
+        return False
+
+    if not assume_sorted:
+        print(f"Sorting '{input_csv_path}' by conversation on disk...")
+        output_dir = os.path.dirname(os.path.abspath(output_csv_path))
+        with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+            sorted_csv_path = os.path.join(tmp_dir, "sorted_input.csv")
+            if not _external_sort_csv(input_csv_path, sorted_csv_path, chunksize, tmp_dir, id_dtype):
+                return False
+            return process_chat_transcript_streaming(
+                sorted_csv_path, output_csv_path, chunksize, assume_sorted=True, per_message=per_message,
+                threads=threads, id_dtype=id_dtype,
+            )
+
+    print(f"Streaming '{input_csv_path}' in chunks of {chunksize} rows ({threads} worker threads)...")
+    progress = {"rows_in": 0, "rows_out": 0, "sorted": True}
+
+    # Written next to the output and renamed over it only once complete, so a
+    # failed run never leaves a truncated file that looks like a result
+    tmp_output_path = output_csv_path + ".tmp"
+    try:
+        with open(tmp_output_path, 'w', newline='', encoding='utf-8') as output_file:
+            def write_output(output_df):
+                output_df.to_csv(output_file, index=False, header=progress["rows_out"] == 0)
+                progress["rows_out"] += len(output_df)
+                print(f"  Read {progress['rows_in']} rows, wrote {progress['rows_out']} rows.")
+
+            reader = pd.read_csv(
+                input_csv_path, chunksize=chunksize, usecols=_is_required_column,
+                dtype={ORIGINAL_CONVERSATION_ID_COL: id_dtype, ORIGINAL_ACTOR_TYPE_COL: "category"},
+            )
+            run_pipeline(
+                _iter_complete_conversations(reader, progress),
+                lambda df: _label_conversations(df, per_message),
+                write_output,
+                workers=threads,
+            )
+    except Exception as e:
+        if os.path.exists(tmp_output_path):
+            os.remove(tmp_output_path)
+        print(f"Error processing input CSV file: {e}")
+        return False
+
+    if not progress["sorted"]:
+        os.remove(tmp_output_path)
+        print(f"Error: '{input_csv_path}' is not sorted by '{ORIGINAL_CONVERSATION_ID_COL}'.")
+        print("Re-run with --unsorted to sort it on disk first.")
+        return False
+
+    os.replace(tmp_output_path, output_csv_path)
+    print(f"\nProcessing complete! Structured data saved to '{output_csv_path}'")
+    print(f"Total rows in output: {progress['rows_out']}")
+    return True
+
+
+def _write_partition_frame(df, path_without_ext):
+    """
+    Writes an intermediate partition without pickling: Parquet when pyarrow is
+    installed, plain CSV otherwise. Returns the path that was written.
+    """
+    if importlib.util.find_spec("pyarrow") is not None:
+        path = path_without_ext + ".parquet"
+        df.to_parquet(path, index=False)
+    else:
+        path = path_without_ext + ".csv"
+        df.to_csv(path, index=False)
+    return path
+
+
+def _read_partition_frame(path, id_dtype=str):
+    """
+    Reads back a frame written by _write_partition_frame. Parquet keeps the
+    column types; the CSV fallback reads the conversation ID as id_dtype and
+    everything else as text.
+    """
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype={ORIGINAL_CONVERSATION_ID_COL: id_dtype, ORIGINAL_ACTOR_TYPE_COL: str,
+                                    ORIGINAL_MESSAGE_PARTS_COL: str})
+
+
+def _partition_input(input_csv_path, tmp_dir, num_partitions, chunksize, id_dtype=str):
+    """
+    Streams the input once and splits it into num_partitions shards by hashing
+    the conversation ID, so every conversation lands in exactly one shard.
+    pandas' hash_pandas_object is used instead of hash() because it is stable
+    across processes and runs. Conversation IDs are read as id_dtype, the
+    other columns as text.
+    Returns one list of shard file paths (in input order) per partition, or None.
+    """
+    partition_paths = [[] for _ in range(num_partitions)]
+    try:
+        chunks = pd.read_csv(
+            input_csv_path, chunksize=chunksize, usecols=_is_required_column,
+            dtype={ORIGINAL_CONVERSATION_ID_COL: id_dtype, ORIGINAL_ACTOR_TYPE_COL: str, ORIGINAL_MESSAGE_PARTS_COL: str},
+        )
+        for chunk_number, chunk in enumerate(chunks):
+            if chunk_number == 0 and not _has_required_columns(chunk.columns):
+                return None
+            chunk = chunk[chunk[ORIGINAL_CONVERSATION_ID_COL].notna()]
+            partition_ids = pd.util.hash_pandas_object(chunk[ORIGINAL_CONVERSATION_ID_COL], index=False).to_numpy() % num_partitions
+            for partition_id, part_df in chunk.groupby(partition_ids):
+                path = os.path.join(tmp_dir, f"input_{partition_id:03d}_{chunk_number:05d}")
+                partition_paths[partition_id].append(_write_partition_frame(part_df, path))
+    except Exception as e:
+        print(f"Error reading input CSV file: {e}")
+        return None
+    return partition_paths
+
+
+def _process_partition(shard_paths, result_csv_path, per_message=False, id_dtype=str):
+    """
+    Worker entry point: loads one partition, parses and labels it with the
+    columnar (or per-message) engine and writes its output rows (sorted by conversation ID) to
+    result_csv_path. Returns the number of rows written.
+    """
+    if not shard_paths:
+        return 0
+    df = pd.concat([_read_partition_frame(path, id_dtype) for path in shard_paths], ignore_index=True)
+    _add_parsed_columns(df)
+    output_df = _build_output_frame(df, per_message)
+    if output_df.empty:
+        return 0
+    output_df.to_csv(result_csv_path, index=False)
+    return len(output_df)
+
+
+def process_chat_transcript_parallel(input_csv_path, output_csv_path, workers, chunksize=DEFAULT_CHUNKSIZE,
+                                     per_message=False):
+    """
+    Multi-process variant of process_chat_transcript.
+    The input is hash-partitioned by conversation ID into one shard per worker
+    (temporary Parquet files, or CSV without pyarrow), the shards are processed
+    in a ProcessPoolExecutor, and the per-shard results are k-way merged by
+    conversation ID so the output order is deterministic and matches the
+    single-process run.
+
+    Conversation IDs keep the type process_chat_transcript would infer, in the
+    shards and in the final merge, so numeric IDs are ordered as numbers.
+    Returns True on success.
+    """
+    if not os.path.exists(input_csv_path):
+        print(f"Error: Input file not found at {input_csv_path}. Please ensure it's in the same directory.")
+        return False
+
+    try:
+        if not _has_required_columns(pd.read_csv(input_csv_path, nrows=0).columns):
+            return False
+        id_dtype = _conversation_id_dtype(input_csv_path, chunksize)
+    except Exception as e:
+        print(f"Error reading input CSV file: {e}")
+        return False
+    id_key = _conversation_id_key(id_dtype)
+
+    output_dir = os.path.dirname(os.path.abspath(output_csv_path))
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        print(f"Partitioning '{input_csv_path}' into {workers} shards...")
+        partition_paths = _partition_input(input_csv_path, tmp_dir, workers, chunksize, id_dtype)
+        if partition_paths is None:
+            return False
+
+        print(f"Processing shards with {workers} workers...")
+        result_paths = [os.path.join(tmp_dir, f"result_{i:03d}.csv") for i in range(workers)]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                row_counts = list(executor.map(
+                    _process_partition, partition_paths, result_paths, [per_message] * workers, [id_dtype] * workers,
+                ))
+        except Exception as e:
+            print(f"Error processing shards: {e}")
+            return False
+        result_paths = [path for path, count in zip(result_paths, row_counts) if count]
+
+        # Each result is already sorted by conversation ID, and a conversation
+        # never spans two results, so a merge on the (typed) ID column is enough.
+        # Like the streaming path, the merge goes to a temporary file that
+        # replaces the output only once complete.
+        tmp_output_path = output_csv_path + ".tmp"
+        result_files = [open(path, newline='', encoding='utf-8') for path in result_paths]
+        try:
+            readers = [csv.reader(result_file) for result_file in result_files]
+            headers = [next(reader) for reader in readers]
+            with open(tmp_output_path, 'w', newline='', encoding='utf-8') as output_file:
+                writer = csv.writer(output_file, lineterminator=os.linesep)
+                if headers:
+                    writer.writerow(headers[0])
+                writer.writerows(heapq.merge(*readers, key=lambda row: id_key(row[0])))
+            os.replace(tmp_output_path, output_csv_path)
+        except Exception as e:
+            if os.path.exists(tmp_output_path):
+                os.remove(tmp_output_path)
+            print(f"Error merging shard results: {e}")
+            return False
+        finally:
+            for result_file in result_files:
+                result_file.close()
+
+    print(f"\nProcessing complete! Structured data saved to '{output_csv_path}'")
+    print(f"Total rows in output: {sum(row_counts)}")
+    return True
+
+
+def _keyword_fingerprint():
+    """
+    Hash of every rule that influences the output rows. Any change to the
+    keyword table, the default intent or the speaker mapping invalidates all
+    previously computed conversations.
+    """
+    rules = {
+        "matcher": MATCHER_VERSION,
+        "intent_keywords": INTENT_KEYWORDS,
+        "default_intent": DEFAULT_INTENT,
+        "speaker_mapping": SPEAKER_MAPPING,
+    }
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _conversation_hashes(df, conv_keys):
+    """
+    Returns a Series mapping each conversation key to a hash of its raw rows
+    (actor type and message_parts, in order). Rows are hashed vectorized, then
+    each conversation's row hashes are folded into one digest.
+    """
+    row_hashes = pd.util.hash_pandas_object(df[[ORIGINAL_ACTOR_TYPE_COL, ORIGINAL_MESSAGE_PARTS_COL]], index=False)
+    return row_hashes.groupby(conv_keys.to_numpy(), sort=False).agg(
+        lambda hashes: hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+    )
+
+
+def _file_fingerprint(path, block_size=1 << 20):
+    """Size, mtime and SHA-256 of a file, recorded in the manifest for the output it describes."""
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def process_chat_transcript_incremental(input_csv_path, output_csv_path, manifest_path=None):
+    """
+    Incremental variant of process_chat_transcript.
+    A manifest next to the output (output_csv_path + ".manifest.json") records a
+    fingerprint of the intent rules and a content hash per conversation. On the
+    next run only new or changed conversations are parsed and labelled; rows of
+    unchanged conversations are copied from the existing output, and
+    conversations that disappeared from the input are dropped. If the rules
+    changed, every conversation is recomputed. So is every conversation when
+    the output file is not the one the manifest describes (its size, mtime or
+    hash differ, e.g. another run overwrote it) or lacks rows of a conversation
+    it should hold.
+
+    The merged output is ordered like a full run, so it is identical to what
+    process_chat_transcript would write. Returns True on success.
+    """
+    if manifest_path is None:
+        manifest_path = output_csv_path + ".manifest.json"
+
+    if not os.path.exists(input_csv_path):
+        print(f"Error: Input file not found at {input_csv_path}. Please ensure it's in the same directory.")
+        return False
+
+    try:
+        df = load_transcript(
+            input_csv_path,
+            conversation_id_col=ORIGINAL_CONVERSATION_ID_COL,
+            actor_type_col=ORIGINAL_ACTOR_TYPE_COL,
+            message_parts_col=ORIGINAL_MESSAGE_PARTS_COL,
+        )
+        print(f"Successfully loaded '{input_csv_path}' with {len(df)} rows.")
+    except Exception as e:
+        print(f"Error reading input CSV file: {e}")
+        return False
+
+    if not _has_required_columns(df.columns):
+        return False
+
+    df = df[df[ORIGINAL_CONVERSATION_ID_COL].notna()]
+    # Conversation IDs are compared as text, the way they appear in the output CSV
+    conv_keys = df[ORIGINAL_CONVERSATION_ID_COL].astype(str)
+    conversation_hashes = _conversation_hashes(df, conv_keys)
+    fingerprint = _keyword_fingerprint()
+
+    manifest = _load_manifest(manifest_path)
+    previous_hashes = {}
+    if manifest is None or not os.path.exists(output_csv_path):
+        print("No previous run found; processing every conversation.")
+    elif manifest.get("keyword_fingerprint") != fingerprint:
+        print("Intent rules changed since the last run; recomputing every conversation.")
+    elif manifest.get("output") != _file_fingerprint(output_csv_path):
+        print(f"'{output_csv_path}' changed since the last run; recomputing every conversation.")
+    else:
+        previous_hashes = manifest.get("conversations", {})
+
+    previous_series = pd.Series(previous_hashes, dtype=object).reindex(conversation_hashes.index)
+    is_changed = (conversation_hashes != previous_series).to_numpy()
+    changed_keys = set(conversation_hashes.index[is_changed])
+    unchanged_keys = set(conversation_hashes.index[~is_changed])
+    removed_count = len(previous_hashes.keys() - set(conversation_hashes.index))
+    new_count = sum(1 for key in changed_keys if key not in previous_hashes)
+    print(f"  {new_count} new, {len(changed_keys) - new_count} changed, {removed_count} removed, "
+          f"{len(unchanged_keys)} unchanged conversations.")
+
+    output_parts = []
+    if unchanged_keys:
+        # Read everything as text so copied rows are written back unchanged
+        existing_df = pd.read_csv(output_csv_path, dtype=str, keep_default_na=False)
+        missing_keys = unchanged_keys - set(existing_df[COL_CONVERSATION_ID])
+        if missing_keys:
+            print(f"  {len(missing_keys)} unchanged conversations have no rows in '{output_csv_path}'; "
+                  "recomputing every conversation.")
+            changed_keys |= unchanged_keys
+        else:
+            output_parts.append(existing_df[existing_df[COL_CONVERSATION_ID].isin(unchanged_keys)])
+
+    delta_df = df[conv_keys.isin(changed_keys)].copy()
+    _add_parsed_columns(delta_df)
+    output_parts.append(_build_output_frame_columnar(delta_df))
+    non_empty_parts = [part for part in output_parts if not part.empty]
+    output_df = pd.concat(non_empty_parts, ignore_index=True) if non_empty_parts else _empty_output_frame()
+
+    if not output_df.empty:
+        # Restore the order of a full run: conversations sorted by their original
+        # ID values, messages in their original order (the sort is stable)
+        sorted_ids = df[ORIGINAL_CONVERSATION_ID_COL].drop_duplicates().sort_values()
+        conversation_rank = pd.Series(np.arange(len(sorted_ids)), index=sorted_ids.astype(str).to_numpy())
+        row_rank = output_df[COL_CONVERSATION_ID].astype(str).map(conversation_rank).to_numpy()
+        output_df = output_df.iloc[np.argsort(row_rank, kind="stable")]
+
+    try:
+        tmp_output_path = output_csv_path + ".tmp"
+        output_df.to_csv(tmp_output_path, index=False)
+        os.replace(tmp_output_path, output_csv_path)
+
+        tmp_manifest_path = manifest_path + ".tmp"
+        with open(tmp_manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "keyword_fingerprint": fingerprint,
+                "output": _file_fingerprint(output_csv_path),
+                "conversations": conversation_hashes.to_dict(),
+            }, f)
+        os.replace(tmp_manifest_path, manifest_path)
+    except Exception as e:
+        print(f"Error saving the processed CSV file: {e}")
+        return False
+
+    print(f"\nProcessing complete! Structured data saved to '{output_csv_path}'")
+    print(f"Total rows in output: {len(output_df)}")
+    return True
 
 # --- Main execution ---
+def main(argv=None):
+    """Command-line entry point; argv defaults to sys.argv[1:]. Returns the exit status."""
+    parser = argparse.ArgumentParser(description="Assign keyword-based intents to chat transcript conversations.")
+    parser.add_argument("--input", default=INPUT_CSV_PATH, help=f"Input transcript CSV (default: {INPUT_CSV_PATH})")
+    parser.add_argument("--output", default=OUTPUT_CSV_PATH, help=f"Output CSV (default: {OUTPUT_CSV_PATH})")
+    parser.add_argument("--engine", choices=["columnar", "rows"], default="columnar", help="In-memory processing engine")
+    parser.add_argument("--stream", action="store_true", help="Process the input in chunks instead of loading it whole")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk in --stream mode")
+    parser.add_argument("--incremental", action="store_true", help="Only reprocess conversations that changed since the last run")
+    parser.add_argument("--workers", type=int, default=1, help="Process conversations in N parallel worker processes")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS,
+                        help="Worker threads labelling chunks in --stream mode, next to the reader and writer")
+    parser.add_argument("--unsorted", action="store_true", help="With --stream: input is not sorted by conversation ID, sort it on disk first")
+    parser.add_argument("--report", nargs="?", const="", default=None, metavar="PATH",
+                        help="Write a JSON run report with per-stage timings and intent statistics "
+                             "(default path: <output>.report.json)")
+    parser.add_argument("--per-message", action="store_true",
+                        help="Also assign an intent to every message ('Message Intent' column); the conversation intent "
+                             "is rolled up from them")
+    parser.add_argument("--profile", action="store_true", help="Run under cProfile and save the stats next to the output (<output>.prof)")
+    args = parser.parse_args(argv)
+
+    report_path = args.report or (args.output + ".report.json" if args.report is not None else None)
+    if report_path and (args.incremental or args.workers > 1 or args.stream):
+        print("Note: --report is only written by the default in-memory mode; use --profile for the other modes.")
+
+    with ExitStack() as stack:
+        if args.profile:
+            stack.enter_context(profiled(args.output + ".prof"))
+        if args.incremental and args.per_message:
+            print("Error: --per-message is not supported with --incremental.")
+            succeeded = False
+        elif args.incremental:
+            succeeded = process_chat_transcript_incremental(args.input, args.output)
+        elif args.workers > 1:
+            succeeded = process_chat_transcript_parallel(
+                args.input, args.output, args.workers, args.chunksize, per_message=args.per_message
+            )
+        elif args.stream:
+            succeeded = process_chat_transcript_streaming(
+                args.input, args.output, args.chunksize, assume_sorted=not args.unsorted, per_message=args.per_message,
+                threads=args.threads,
+            )
+        else:
+            succeeded = process_chat_transcript(
+                args.input, args.output, engine=args.engine, report_path=report_path, per_message=args.per_message
+            )
+    return 0 if succeeded else 1
+
+
 if __name__ == "__main__":
-    process_chat_transcript(INPUT_CSV_PATH, OUTPUT_CSV_PATH)
+    sys.exit(main())
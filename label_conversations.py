@@ -1,14 +1,18 @@
 import streamlit as st
 import pandas as pd
-import json
+import argparse
 import os
-import re
+
+from label_store import append_labels, init_label_store, load_labeled_keys
+from transcript_cache import DISPLAY_TEXT_COL, MATCH_TEXT_COL, load_transcript
 
 # -------------------------------
 # Configuration
 # -------------------------------
 INPUT_CSV_PATH = "Ugochukwu.csv"
-OUTPUT_CSV_PATH = "labeled_output_per_message.csv"
+OUTPUT_CSV_PATH = "labeled_output_per_message.csv" # Imported into the label store on first run
+LABEL_DB_PATH = "labels.sqlite3"
+MESSAGES_PER_PAGE = 30 # Messages rendered per page of a long conversation
 
 ORIGINAL_CONVERSATION_ID_COL = 'conversation_id'
 ORIGINAL_ACTOR_TYPE_COL = 'actor_type'
@@ -35,91 +39,133 @@ INTENT_OPTIONS = [
     "system message",
     "Transaction history"
 ]
+NO_OVERRIDE = "(Use default)"
+
+# Paths can be overridden on the command line:
+#   streamlit run label_conversations.py -- --input Temitope.csv
+# (or `python cli.py label --input Temitope.csv`)
+_arg_parser = argparse.ArgumentParser(description="Label chat transcript conversations.")
+_arg_parser.add_argument("--input", default=INPUT_CSV_PATH, help="Transcript CSV to label")
+_arg_parser.add_argument("--db", default=LABEL_DB_PATH, help="SQLite label store")
+_args, _ = _arg_parser.parse_known_args()
+INPUT_CSV_PATH, LABEL_DB_PATH = _args.input, _args.db
 
 # -------------------------------
 # Helper Functions
 # -------------------------------
 
-def extract_message_content(message_parts_str):
-    if pd.isna(message_parts_str) or not isinstance(message_parts_str, str):
-        return ""
-    try:
-        message_parts = json.loads(message_parts_str)
-        if not isinstance(message_parts, list):
-            raise ValueError("message_parts is not a list")
-        content_pieces = []
-        for part in message_parts:
-            if 'text' in part and isinstance(part.get('text'), dict):
-                content_pieces.append(part['text'].get('content', ''))
-            elif 'image' in part:
-                content_pieces.append("[Image Attached]")
-            elif 'file' in part:
-                content_pieces.append(f"[File: {part['file'].get('name', 'Unknown')}]")
-        return " ".join(content_pieces).strip()
-    except Exception:
-        return message_parts_str[:100]
-
-def clean_html(raw_html):
-    cleanr = re.compile('<.*?>')
-    return re.sub(cleanr, '', raw_html)
+def is_meaningful(messages, actor_types):
+    """Vectorized mask of messages that need a label (non-empty, not from the system)."""
+    speakers = actor_types.astype(object).map(lambda actor: SPEAKER_MAPPING.get(actor, actor))
+    return messages.str.strip().astype(bool) & (speakers.astype(str).str.lower() != "system")
+
+def message_html(speaker, message):
+    color = "#cc2634" if speaker == "Customer" else "#29c54d"
+    return f"""
+    <div style="background-color: {color}; padding: 10px; border-radius: 5px; margin: 5px 0;">
+        <strong>{speaker}:</strong> {message}
+    </div>
+    """
+
+def build_label_index(df, labeled_message_ids):
+    """
+    Returns the session index:
+      - "labeled": set of (conversation_id, message) keys already labeled
+      - "pending": conversation_id -> {message: row count} of unlabeled messages,
+        in conversation order, holding only conversations with work left
+      - "remaining": total number of unlabeled message rows
+      - "positions": conversation_id -> row positions in df
+      - "last_label_id": highest label store id already applied to the index
+    """
+    meaningful = is_meaningful(df['parsed_message_content'], df[ORIGINAL_ACTOR_TYPE_COL])
+    meaningful &= df[ORIGINAL_CONVERSATION_ID_COL].notna() # groupby() never shows these rows
+    candidates = df.loc[meaningful, [ORIGINAL_CONVERSATION_ID_COL, 'parsed_message_content']]
+    candidates = candidates.sort_values(ORIGINAL_CONVERSATION_ID_COL, kind="stable")
+
+    pending = {}
+    remaining = 0
+    for key in zip(candidates[ORIGINAL_CONVERSATION_ID_COL], candidates['parsed_message_content']):
+        if key not in labeled_message_ids:
+            conv_pending = pending.setdefault(key[0], {})
+            conv_pending[key[1]] = conv_pending.get(key[1], 0) + 1
+            remaining += 1
+
+    return {
+        "labeled": labeled_message_ids,
+        "pending": pending,
+        "remaining": remaining,
+        "positions": df.groupby(ORIGINAL_CONVERSATION_ID_COL, observed=True).indices,
+        "last_label_id": 0,
+    }
+
+def mark_conversation_labeled(label_index, conv_id):
+    """Moves every pending message of conv_id into the labeled set in O(messages)."""
+    conv_pending = label_index["pending"].pop(conv_id, {})
+    label_index["labeled"].update((conv_id, message) for message in conv_pending)
+    label_index["remaining"] -= sum(conv_pending.values())
+
+def apply_new_labels(label_index, keys):
+    """Removes (conversation_id, message) keys labeled elsewhere, e.g. by another annotator."""
+    pending = label_index["pending"]
+    for conv_id, message in keys - label_index["labeled"]:
+        label_index["labeled"].add((conv_id, message))
+        conv_pending = pending.get(conv_id)
+        if conv_pending and message in conv_pending:
+            label_index["remaining"] -= conv_pending.pop(message)
+            if not conv_pending:
+                del pending[conv_id]
 
 # -------------------------------
 # Load Data
 # -------------------------------
 
 @st.cache_data
-def load_data():
-    if not os.path.exists(INPUT_CSV_PATH):
-        st.error(f"File {INPUT_CSV_PATH} not found.")
+def load_data(input_csv_path):
+    if not os.path.exists(input_csv_path):
+        st.error(f"File {input_csv_path} not found.")
         st.stop()
-    df = pd.read_csv(INPUT_CSV_PATH)
-    df['parsed_message_content'] = df[ORIGINAL_MESSAGE_PARTS_COL].apply(extract_message_content)
-    df['parsed_message_content'] = df['parsed_message_content'].apply(clean_html)
+    df = load_transcript(
+        input_csv_path,
+        flavor="lenient",
+        conversation_id_col=ORIGINAL_CONVERSATION_ID_COL,
+        actor_type_col=ORIGINAL_ACTOR_TYPE_COL,
+        message_parts_col=ORIGINAL_MESSAGE_PARTS_COL,
+        normalize=True, # HTML is stripped in the shared, cached normalization stage
+    )
+    df['parsed_message_content'] = df.pop(DISPLAY_TEXT_COL)
+    del df[MATCH_TEXT_COL]
     return df
 
-df = load_data()
+df = load_data(INPUT_CSV_PATH)
 
 # -------------------------------
-# Load or Initialize labeled data
+# Conversation index (built once per session)
 # -------------------------------
+# Rebuilding the list of unlabeled conversations on every rerun means a
+# groupby + iterrows over the whole file per click. Instead, an index of
+# conversation -> unlabeled messages is built once and kept in session state,
+# and updated in place whenever a conversation is saved.
+
+if "label_index" not in st.session_state:
+    init_label_store(LABEL_DB_PATH, OUTPUT_CSV_PATH)
+    st.session_state.label_index = build_label_index(df, set())
+label_index = st.session_state.label_index
 
-if os.path.exists(OUTPUT_CSV_PATH):
-    labeled_df = pd.read_csv(OUTPUT_CSV_PATH)
-    labeled_message_ids = set(zip(labeled_df[ORIGINAL_CONVERSATION_ID_COL], labeled_df['Message']))
-else:
-    labeled_df = pd.DataFrame(columns=[
-        ORIGINAL_CONVERSATION_ID_COL, 'Speaker', 'Message', 'Intent'
-    ])
-    labeled_message_ids = set()
+# Pick up labels saved since the last rerun (ours or other annotators')
+new_label_keys, label_index["last_label_id"] = load_labeled_keys(LABEL_DB_PATH, after_id=label_index["last_label_id"])
+apply_new_labels(label_index, new_label_keys)
+labeled_message_ids = label_index["labeled"]
 
 # -------------------------------
 # Find next conversation that isn't fully labeled
 # -------------------------------
-unlabeled_conversations = []
-for conv_id, conv_df in df.groupby(ORIGINAL_CONVERSATION_ID_COL):
-    meaningful_msgs = [
-        msg for _, row in conv_df.iterrows()
-        if (msg := row['parsed_message_content']) 
-        and msg.strip()
-        and SPEAKER_MAPPING.get(row[ORIGINAL_ACTOR_TYPE_COL], row[ORIGINAL_ACTOR_TYPE_COL]).lower() != "system"
-    ]
-    if any((conv_id, msg) not in labeled_message_ids for msg in meaningful_msgs):
-        unlabeled_conversations.append((conv_id, conv_df))
-
-total_unlabeled_messages = sum(
-    1 for conv_id, conv_df in unlabeled_conversations 
-    for _, row in conv_df.iterrows()
-    if (msg := row['parsed_message_content'])
-    and msg.strip()
-    and SPEAKER_MAPPING.get(row[ORIGINAL_ACTOR_TYPE_COL], row[ORIGINAL_ACTOR_TYPE_COL]).lower() != "system"
-    and (conv_id, msg) not in labeled_message_ids
-)
-
-if not unlabeled_conversations:
+if not label_index["pending"]:
     st.success("🎉 All conversations have been labeled!")
     st.stop()
 
-current_conv_id, current_conv_df = unlabeled_conversations[0]
+current_conv_id = next(iter(label_index["pending"]))
+current_conv_df = df.iloc[label_index["positions"][current_conv_id]]
+total_unlabeled_messages = label_index["remaining"]
 
 st.markdown(f"### Conversation ID: `{current_conv_id}`")
 st.markdown(f"⏳ **{total_unlabeled_messages} messages left to label**")
@@ -127,33 +173,58 @@ st.markdown(f"⏳ **{total_unlabeled_messages} messages left to label**")
 st.divider()
 
 # -------------------------------
-# Show messages with option to override
+# Show one page of messages with option to override
 # -------------------------------
-message_intent_overrides = {}
+# Escalation chats run to hundreds of turns, so only one page of messages is
+# rendered per rerun, as a single HTML block, and the overrides for that page
+# are edited in one data_editor grid instead of one selectbox per message.
+# Overrides are kept in session state (row label -> intent) so they survive
+# page changes until the conversation is saved.
+speakers = current_conv_df[ORIGINAL_ACTOR_TYPE_COL].astype(object).map(lambda actor: SPEAKER_MAPPING.get(actor, actor))
+conv_messages = current_conv_df.assign(Speaker=speakers)
+# Skip empty or purely system messages for labeling
+conv_messages = conv_messages[is_meaningful(conv_messages['parsed_message_content'], conv_messages[ORIGINAL_ACTOR_TYPE_COL])]
 
-for idx, row in current_conv_df.iterrows():
-    message = row['parsed_message_content']
-    speaker = SPEAKER_MAPPING.get(row[ORIGINAL_ACTOR_TYPE_COL], row[ORIGINAL_ACTOR_TYPE_COL])
+message_intent_overrides = st.session_state.setdefault("message_overrides", {}).setdefault(current_conv_id, {})
 
-    # Skip empty or purely system messages for labeling
-    if not message.strip() or speaker.lower() == "system":
-        continue
+page_count = max(1, -(-len(conv_messages) // MESSAGES_PER_PAGE))
+page = 1
+if page_count > 1:
+    page = st.number_input(
+        f"Page (of {page_count}, {MESSAGES_PER_PAGE} messages each)",
+        min_value=1, max_value=page_count, step=1, key=f"page_{current_conv_id}"
+    )
+page_messages = conv_messages.iloc[(page - 1) * MESSAGES_PER_PAGE:page * MESSAGES_PER_PAGE]
 
-    color = "#cc2634" if speaker == "Customer" else "#29c54d"
-    st.markdown(f"""
-    <div style="background-color: {color}; padding: 10px; border-radius: 5px; margin: 5px 0;">
-        <strong>{speaker}:</strong> {message}
-    </div>
-    """, unsafe_allow_html=True)
+st.markdown(
+    "".join(map(message_html, page_messages['Speaker'], page_messages['parsed_message_content'])),
+    unsafe_allow_html=True
+)
 
-    if (current_conv_id, message) not in labeled_message_ids:
-        selected_intent = st.selectbox(
-            f"Override intent for this message? (or leave as default below)",
-            ["(Use default)"] + INTENT_OPTIONS,
-            key=f"{current_conv_id}_{idx}"
-        )
-        if selected_intent != "(Use default)":
-            message_intent_overrides[message] = selected_intent
+unlabeled = [(current_conv_id, message) not in labeled_message_ids for message in page_messages['parsed_message_content']]
+editable_messages = page_messages[unlabeled]
+if not editable_messages.empty:
+    st.markdown("Override the intent of individual messages (or leave them on the default below):")
+    override_grid = pd.DataFrame({
+        "Speaker": editable_messages['Speaker'],
+        "Message": editable_messages['parsed_message_content'],
+        "Intent": [message_intent_overrides.get(idx, NO_OVERRIDE) for idx in editable_messages.index],
+    })
+    edited_grid = st.data_editor(
+        override_grid,
+        column_config={
+            "Intent": st.column_config.SelectboxColumn(options=[NO_OVERRIDE] + INTENT_OPTIONS, required=True),
+        },
+        disabled=["Speaker", "Message"],
+        hide_index=True,
+        width="stretch",
+        key=f"overrides_{current_conv_id}_{page}",
+    )
+    for idx, intent in edited_grid["Intent"].items():
+        if intent in INTENT_OPTIONS:
+            message_intent_overrides[idx] = intent
+        else:
+            message_intent_overrides.pop(idx, None)
 
 st.divider()
 
@@ -167,23 +238,19 @@ default_intent = st.selectbox("Select default intent:", INTENT_OPTIONS)
 # Save logic
 # -------------------------------
 if st.button("✅ Save intents for this conversation & next"):
+    intents_by_message = {
+        conv_messages.at[idx, 'parsed_message_content']: intent for idx, intent in message_intent_overrides.items()
+    }
     new_rows = []
-    for _, row in current_conv_df.iterrows():
-        message = row['parsed_message_content']
-        speaker = SPEAKER_MAPPING.get(row[ORIGINAL_ACTOR_TYPE_COL], row[ORIGINAL_ACTOR_TYPE_COL])
-
-        if not message.strip() or speaker.lower() == "system":
-            continue
-
+    for speaker, message in zip(conv_messages['Speaker'], conv_messages['parsed_message_content']):
         if (current_conv_id, message) not in labeled_message_ids:
-            intent = message_intent_overrides.get(message, default_intent)
             new_rows.append({
-                ORIGINAL_CONVERSATION_ID_COL: current_conv_id,
+                'conversation_id': current_conv_id,
                 'Speaker': speaker,
                 'Message': message,
-                'Intent': intent
+                'Intent': intents_by_message.get(message, default_intent)
             })
-    if new_rows:
-        labeled_df = pd.concat([labeled_df, pd.DataFrame(new_rows)], ignore_index=True)
-        labeled_df.to_csv(OUTPUT_CSV_PATH, index=False)
+    append_labels(new_rows, LABEL_DB_PATH) # Only the new rows are written
+    mark_conversation_labeled(label_index, current_conv_id)
+    del st.session_state.message_overrides[current_conv_id]
     st.rerun()
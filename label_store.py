@@ -0,0 +1,157 @@
+"""
+Append-only, crash-safe label storage for label_conversations.py.
+
+Labels used to live in labeled_output_per_message.csv, which was re-read,
+concatenated and rewritten in full on every save. That cost grows with the
+square of the session length, and a crash mid-write could corrupt the file.
+
+Labels are now stored in a local SQLite database:
+- each save is one small transaction that only inserts the new rows,
+- WAL journaling with synchronous=FULL makes every committed save durable,
+  and an interrupted write is rolled back instead of corrupting the store,
+- several annotators (Streamlit sessions or processes) can write to the same
+  database; writers wait for each other instead of overwriting each other,
+- a unique index on (conversation_id, message) keeps one label per message.
+
+The CSV format is still available through export_labels_csv(), and an existing
+labeled_output_per_message.csv is imported the first time a store is created.
+
+Usage:
+    python label_store.py export --db labels.sqlite3 --output labeled_output_per_message.csv
+"""
+import argparse
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import pandas as pd
+
+DEFAULT_DB_PATH = "labels.sqlite3"
+DEFAULT_CSV_PATH = "labeled_output_per_message.csv"
+
+# CSV column names, matching the original labeled_output_per_message.csv
+CSV_COLUMNS = ['conversation_id', 'Speaker', 'Message', 'Intent']
+
+# Seconds a writer waits for another annotator's transaction to finish
+BUSY_TIMEOUT = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id NOT NULL, -- no type affinity: IDs keep the type they were saved with
+    speaker TEXT,
+    message TEXT NOT NULL,
+    intent TEXT NOT NULL,
+    labeled_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS labels_conversation_message ON labels (conversation_id, message);
+"""
+
+_UPSERT = """
+INSERT INTO labels (conversation_id, speaker, message, intent, labeled_at)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (conversation_id, message) DO UPDATE SET
+    speaker = excluded.speaker,
+    intent = excluded.intent,
+    labeled_at = excluded.labeled_at
+"""
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL") # fsync on every commit
+    return conn
+
+
+def _sql_value(value):
+    """Converts numpy scalars (e.g. int64 conversation IDs) to plain Python values."""
+    return value.item() if hasattr(value, "item") else value
+
+
+def _label_params(rows, labeled_at):
+    return [
+        (
+            _sql_value(row['conversation_id']),
+            row.get('Speaker'),
+            row['Message'],
+            row['Intent'],
+            labeled_at,
+        )
+        for row in rows
+    ]
+
+
+def init_label_store(db_path=DEFAULT_DB_PATH, legacy_csv_path=DEFAULT_CSV_PATH):
+    """
+    Creates the label database if needed. When the store is empty and a CSV
+    from the previous file-based storage exists, its rows are imported once.
+    """
+    with closing(_connect(db_path)) as conn:
+        conn.executescript(_SCHEMA)
+        is_empty = conn.execute("SELECT 1 FROM labels LIMIT 1").fetchone() is None
+        if is_empty and legacy_csv_path and os.path.exists(legacy_csv_path):
+            legacy_df = pd.read_csv(legacy_csv_path)
+            rows = legacy_df.dropna(subset=['Message', 'Intent']).to_dict('records')
+            with conn:
+                conn.executemany(_UPSERT, _label_params(rows, time.time()))
+            print(f"Imported {len(rows)} labels from '{legacy_csv_path}' into '{db_path}'.")
+
+
+def append_labels(rows, db_path=DEFAULT_DB_PATH):
+    """
+    Durably stores labels in a single transaction. rows are dicts with
+    'conversation_id', 'Speaker', 'Message' and 'Intent' keys. Labeling a
+    message again replaces its previous label.
+    """
+    if not rows:
+        return
+    with closing(_connect(db_path)) as conn:
+        with conn:
+            conn.executemany(_UPSERT, _label_params(rows, time.time()))
+
+
+def load_labeled_keys(db_path=DEFAULT_DB_PATH, after_id=0):
+    """
+    Returns (keys, last_id): the set of (conversation_id, message) pairs stored
+    with an id greater than after_id, and the highest id seen. Passing the
+    previous last_id back in fetches only labels saved since then, e.g. by
+    other annotators.
+    """
+    with closing(_connect(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT id, conversation_id, message FROM labels WHERE id > ? ORDER BY id", (after_id,)
+        ).fetchall()
+    keys = {(conversation_id, message) for _, conversation_id, message in rows}
+    last_id = rows[-1][0] if rows else after_id
+    return keys, last_id
+
+
+def export_labels_csv(csv_path=DEFAULT_CSV_PATH, db_path=DEFAULT_DB_PATH):
+    """Writes all labels, in the order they were first saved, to csv_path. Returns the row count."""
+    with closing(_connect(db_path)) as conn:
+        labels_df = pd.read_sql_query(
+            "SELECT conversation_id, speaker, message, intent FROM labels ORDER BY id", conn
+        )
+    labels_df.columns = CSV_COLUMNS
+    tmp_path = csv_path + ".tmp"
+    labels_df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, csv_path)
+    return len(labels_df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the label store used by label_conversations.py.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export all labels to a CSV file")
+    export_parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"Label database (default: {DEFAULT_DB_PATH})")
+    export_parser.add_argument("--output", default=DEFAULT_CSV_PATH, help=f"CSV to write (default: {DEFAULT_CSV_PATH})")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        if not os.path.exists(args.db):
+            print(f"Error: Label database '{args.db}' not found.")
+        else:
+            count = export_labels_csv(args.output, args.db)
+            print(f"Exported {count} labels to '{args.output}'.")
@@ -0,0 +1,165 @@
+"""
+Shared decoding of the `message_parts` JSON column found in chat transcript exports.
+
+Every script used to carry its own copy of this logic and called json.loads once
+per row. This module keeps one implementation with three speed-ups:
+
+- a faster JSON decoder (orjson) when it is installed, with a stdlib fallback,
+- a bounded LRU cache keyed on the raw string, since bot templates, menus and
+  "[Image Attached]" payloads repeat constantly,
+- a regex fast path for the most common payload, a single plain text part,
+  which skips JSON decoding altogether.
+
+Two flavours are exposed because the scripts historically disagree on edge cases:
+extract_message_content() follows intent_detection.py, and
+extract_message_content_lenient() follows label_conversations.py / generate_json.py.
+
+The normalization helpers at the bottom turn extracted messages into display
+text (HTML tags removed) and matching text (tags removed, entities unescaped,
+whitespace collapsed, lowercased), column-at-a-time with precompiled patterns.
+"""
+import functools
+import html
+import json
+import re
+
+try:
+    import orjson
+    _json_loads = orjson.loads # orjson.JSONDecodeError subclasses json.JSONDecodeError
+except ImportError:
+    _json_loads = json.loads
+
+# Number of distinct raw payloads remembered per flavour
+MESSAGE_CACHE_SIZE = 65536
+
+# '[{"text": {"content": "..."}}]' whose content needs no JSON unescaping.
+# Quotes, backslashes and control characters fall through to the full parser.
+_SINGLE_TEXT_PART = re.compile(r'\[\s*\{\s*"text"\s*:\s*\{\s*"content"\s*:\s*"([^"\\\x00-\x1f]*)"\s*\}\s*\}\s*\]')
+
+
+@functools.lru_cache(maxsize=MESSAGE_CACHE_SIZE)
+def _extract_strict(message_parts_str):
+    fast_match = _SINGLE_TEXT_PART.fullmatch(message_parts_str)
+    if fast_match:
+        return fast_match.group(1).strip()
+
+    message_content = []
+    try:
+        message_parts = _json_loads(message_parts_str)
+        if not isinstance(message_parts, list): # Ensure it's a list as expected
+            raise ValueError("message_parts is not a list")
+
+        for part in message_parts:
+            if 'text' in part and isinstance(part.get('text'), dict) and 'content' in part['text']:
+                content = part['text']['content']
+                if content: # Only add if content is not empty
+                    message_content.append(content)
+            elif 'image' in part and isinstance(part.get('image'), dict) and 'url' in part['image']:
+                message_content.append("[Image Attached]")
+            elif 'file' in part and isinstance(part.get('file'), dict) and 'name' in part['file']:
+                message_content.append(f"[File: {part['file']['name']}]")
+    except (json.JSONDecodeError, ValueError) as e:
+        # Fallback if JSON is malformed or structure is unexpected
+        print(f"Warning: Could not parse message_parts JSON: {e}. Raw content: {message_parts_str[:100]}...")
+        return str(message_parts_str) # Return raw string if parsing fails
+    except Exception as e:
+        print(f"An unexpected error occurred during message part extraction: {e}. Raw content: {message_parts_str[:100]}...")
+        return str(message_parts_str)
+
+    return " ".join(message_content).strip()
+
+
+@functools.lru_cache(maxsize=MESSAGE_CACHE_SIZE)
+def _extract_lenient(message_parts_str):
+    fast_match = _SINGLE_TEXT_PART.fullmatch(message_parts_str)
+    if fast_match:
+        return fast_match.group(1).strip()
+
+    try:
+        message_parts = _json_loads(message_parts_str)
+        if not isinstance(message_parts, list):
+            raise ValueError("message_parts is not a list")
+        content_pieces = []
+        for part in message_parts:
+            if 'text' in part and isinstance(part.get('text'), dict):
+                content_pieces.append(part['text'].get('content', ''))
+            elif 'image' in part:
+                content_pieces.append("[Image Attached]")
+            elif 'file' in part:
+                content_pieces.append(f"[File: {part['file'].get('name', 'Unknown')}]")
+        return " ".join(content_pieces).strip()
+    except Exception:
+        return message_parts_str[:100]
+
+
+def extract_message_content(message_parts_str):
+    """
+    Parses the 'message_parts' JSON string and extracts text content,
+    or notes about images/files.
+    Empty text parts are skipped, and a payload that cannot be parsed is
+    returned unchanged (with a warning printed the first time it is seen).
+    Non-string inputs such as NaN give an empty string.
+    """
+    if not isinstance(message_parts_str, str):
+        return "" # Return empty string for NaN or non-string inputs
+    return _extract_strict(message_parts_str)
+
+
+def extract_message_content_lenient(message_parts_str):
+    """
+    Like extract_message_content, but parts are accepted with missing fields
+    (files without a name become "[File: Unknown]") and a payload that cannot
+    be parsed is silently truncated to its first 100 characters.
+    """
+    if not isinstance(message_parts_str, str):
+        return ""
+    return _extract_lenient(message_parts_str)
+
+
+def clear_message_cache():
+    """Empties the per-payload caches, e.g. between unrelated input files."""
+    _extract_strict.cache_clear()
+    _extract_lenient.cache_clear()
+
+
+# --- Normalization ---
+# Patterns are kept as plain strings for the Series helpers: pandas then runs
+# them as native pyarrow string kernels, which a compiled re.Pattern would
+# force back onto a per-row Python loop. Both patterns mean the same thing in
+# Python's re and in pyarrow's RE2, so the scalar helper agrees with them.
+
+# Same pattern the labeling app has always used to strip tags from messages
+_HTML_TAG_PATTERN = r'<.*?>'
+# ASCII whitespace plus the Unicode spaces seen in chat exports (NBSP, thin spaces, ...)
+_WHITESPACE_PATTERN = '[\t\n\v\f\r \u00a0\u2000-\u200a\u202f\u205f\u3000]+'
+
+_HTML_TAG = re.compile(_HTML_TAG_PATTERN)
+_WHITESPACE = re.compile(_WHITESPACE_PATTERN)
+
+
+def strip_html(messages):
+    """Removes HTML tags from a Series of messages (the labeling app's display text)."""
+    return messages.str.replace(_HTML_TAG_PATTERN, '', regex=True)
+
+
+def normalize_for_matching(messages, html_stripped=False):
+    """
+    Vectorized normalization of a Series of messages for keyword matching:
+    HTML tags are stripped (skipped when html_stripped is set), entities such
+    as &amp; are unescaped, runs of whitespace become one space and the text is
+    lowercased. Only messages containing '&' go through html.unescape.
+    """
+    text = messages if html_stripped else strip_html(messages)
+    has_entity = text.str.contains('&', regex=False).fillna(False).to_numpy(dtype=bool)
+    if has_entity.any():
+        text = text.copy()
+        text[has_entity] = text[has_entity].map(html.unescape)
+    return text.str.replace(_WHITESPACE_PATTERN, ' ', regex=True).str.strip().str.lower()
+
+
+def normalize_text(text):
+    """Scalar version of normalize_for_matching, for a single string."""
+    text = _HTML_TAG.sub('', text)
+    if '&' in text:
+        text = html.unescape(text)
+    return _WHITESPACE.sub(' ', text).strip().lower()
@@ -0,0 +1,79 @@
+"""
+Threaded read -> process -> write pipeline for chunked jobs.
+
+The chunked scripts used to read a chunk, process it, write it and only then
+read the next one, so the disk sat idle while the CPU worked and the other way
+round. run_pipeline() overlaps the three stages:
+
+    reader thread     pulls chunks from the source iterator (CSV/Parquet reads)
+    worker threads    run process(chunk) (parsing, matching, serializing)
+    calling thread    writes results with write(result), in input order
+
+At most `max_pending` chunks are in flight between the reader and the writer.
+When the writer falls behind, the reader waits (backpressure), so memory stays
+bounded by a few chunks however large the input is. pandas, numpy, pyarrow and
+file I/O release the GIL for most of their work, which is what lets the
+stages run concurrently.
+
+    run_pipeline(pd.read_csv(path, chunksize=100_000), parse_chunk, write_chunk, workers=2)
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads used when a script does not say otherwise
+DEFAULT_WORKERS = 2
+
+_END = object() # Marks the end of the source in the pending queue
+
+
+def run_pipeline(chunks, process, write, workers=DEFAULT_WORKERS, max_pending=None):
+    """
+    Runs process() on every item of the iterable chunks in `workers` threads,
+    while a reader thread consumes chunks ahead and the calling thread passes
+    each result to write() in input order. max_pending (default 2 * workers)
+    bounds the chunks read but not yet written.
+    An exception raised by the source, process() or write() stops the pipeline
+    and is re-raised here. Returns the number of chunks written.
+    """
+    max_pending = max_pending or 2 * workers
+    free_slots = threading.Semaphore(max_pending)
+    pending = queue.Queue() # Futures in input order; its length is bounded by free_slots
+    stopped = threading.Event()
+
+    def read(executor):
+        try:
+            for chunk in chunks:
+                while not free_slots.acquire(timeout=0.1):
+                    if stopped.is_set():
+                        return
+                if stopped.is_set():
+                    return
+                pending.put(executor.submit(process, chunk))
+        except BaseException as e:
+            pending.put(e)
+            return
+        pending.put(_END)
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline-worker") as executor:
+        reader = threading.Thread(target=read, args=(executor,), name="pipeline-reader", daemon=True)
+        reader.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is _END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                write(item.result())
+                free_slots.release()
+                written += 1
+        finally:
+            stopped.set()
+            reader.join()
+            while not pending.empty(): # Drop work that will never be written
+                item = pending.get_nowait()
+                if hasattr(item, "cancel"):
+                    item.cancel()
+    return written
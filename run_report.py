@@ -0,0 +1,130 @@
+"""
+Stage timing and run reports for the pipeline scripts.
+
+A run report is a plain dict. Pipeline code wraps each stage in
+`with stage(report, "read_csv") as s:` and sets s["rows"] when it knows how
+many rows the stage handled; wall time, rows/sec and the change in resident
+memory are filled in when the block exits. Passing report=None turns every
+stage into a no-op, so instrumented functions cost nothing when nobody asked
+for a report.
+
+    report = new_run_report("intent_detection", input="Ugochukwu.csv")
+    with stage(report, "read_csv") as s:
+        df = pd.read_csv(...)
+        s["rows"] = len(df)
+    write_run_report(report, "run_report.json")
+
+profiled() wraps a block in cProfile and saves both the raw stats (for
+snakeviz / pstats) and a text summary of the hottest functions.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+# Functions listed in the text summary written by profiled()
+PROFILE_TOP_FUNCTIONS = 40
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB (None where the resource module is missing, e.g. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KiB on Linux
+
+
+def current_rss_mb():
+    """Current resident memory in MB (from /proc on Linux; the peak elsewhere, or None)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def new_run_report(pipeline, **details):
+    """Starts a report for one run; details (input path, engine, ...) are stored as-is."""
+    return {
+        "pipeline": pipeline,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **details,
+        "stages": [],
+        "_start": time.perf_counter(),
+    }
+
+
+@contextmanager
+def stage(report, name):
+    """
+    Times the enclosed block as stage `name` of report. Yields the stage's
+    record so the block can set "rows" (and any other counters). Stages that
+    raise are still recorded, with "failed": True.
+    """
+    record = {"name": name}
+    if report is None:
+        yield record
+        return
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        record["failed"] = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        record["seconds"] = round(seconds, 4)
+        if record.get("rows") is not None and seconds > 0:
+            record["rows_per_sec"] = round(record["rows"] / seconds, 1)
+        rss_after = current_rss_mb()
+        if rss_before is not None and rss_after is not None:
+            record["rss_delta_mb"] = round(rss_after - rss_before, 1)
+        report["stages"].append(record)
+
+
+def finish_run_report(report):
+    """Adds total wall time and peak memory. Returns the report."""
+    report["total_seconds"] = round(time.perf_counter() - report.pop("_start"), 4)
+    peak = peak_rss_mb()
+    report["peak_rss_mb"] = round(peak, 1) if peak is not None else None
+    return report
+
+
+def write_run_report(report, report_path):
+    """Finishes report (if needed) and writes it to report_path as JSON."""
+    if "_start" in report:
+        finish_run_report(report)
+    tmp_path = report_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, default=str)
+    os.replace(tmp_path, report_path)
+
+
+@contextmanager
+def profiled(profile_path):
+    """
+    Runs the enclosed block under cProfile. Raw stats go to profile_path and
+    the top functions by cumulative time to profile_path + ".txt".
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        with open(profile_path + ".txt", 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        print(f"Profile saved to '{profile_path}' (summary: '{profile_path}.txt').")
@@ -0,0 +1,36 @@
+"""
+cli.py must report failures through its exit status, for single commands and
+for every failed job of a batch.
+"""
+import pytest
+
+from cli import main, run_batch
+
+
+@pytest.mark.parametrize("argv", [
+    ["detect-intents", "--input", "missing.csv", "--output", "out.csv"],
+    ["detect-intents", "--input", "missing.csv", "--output", "out.csv", "--stream"],
+    ["detect-intents", "--input", "no_columns.csv", "--output", "out.csv"],
+    ["detect-intents", "--input", "no_columns.csv", "--output", "out.csv", "--workers", "2"],
+    ["export-jsonl", "--input", "missing.csv", "--output", "out.jsonl"],
+    ["split", "--input", "no_columns.csv", "--outputs", "a.csv", "b.csv"],
+])
+def test_failed_command_exits_non_zero(tmp_path, argv):
+    (tmp_path / "no_columns.csv").write_text("col\n1\n")
+    assert main(argv) == 1
+
+
+def test_successful_command_exits_zero(tmp_path):
+    (tmp_path / "input.csv").write_text(
+        'conversation_id,actor_type,message_parts\n1,user,"[{""text"": {""content"": ""hello""}}]"\n'
+    )
+    assert main(["export-jsonl", "--input", "input.csv", "--output", "out.jsonl"]) == 0
+
+
+def test_batch_counts_failed_jobs():
+    jobs = [
+        ["detect-intents", "--input", "missing.csv", "--output", "out.csv"],
+        ["export-jsonl", "--input", "missing.csv", "--output", "out.jsonl"],
+        ["label"],
+    ]
+    assert run_batch(jobs) == 3
@@ -0,0 +1,94 @@
+"""
+divide_csv.py must keep every conversation in one output, route rows the same
+way in all of its modes (pandas streaming, byte-range copy of grouped input,
+parallel byte-range copy) and describe the files it wrote in its manifest.
+"""
+import csv
+import hashlib
+import json
+import os
+import random
+
+import pytest
+
+from divide_csv import MANIFEST_SUFFIX, divide_csv_file
+
+PARTS = 3
+
+# Quoted commas, quotes and line breaks inside fields, which the byte-range split must not cut
+MESSAGES = ["hello", "a, b and c", 'she said "hi"', "line one\nline two", "", "ok"]
+
+
+def write_export(path, conversation_count=40, seed=0):
+    """A grouped export (each conversation's rows are contiguous) with an extra column."""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["conversation_id", "actor_type", "message_parts", "created_at"])
+        for number in range(conversation_count):
+            conversation_id = f"conv-{number:03d}" if number % 3 else str(number)
+            for message in range(rng.randint(1, 6)):
+                content = json.dumps([{"text": {"content": rng.choice(MESSAGES)}}])
+                writer.writerow([conversation_id, rng.choice(["user", "bot"]), content, f"2025-01-01 00:00:{message:02d}"])
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def split(tmp_path, name, **options):
+    output_names = [str(tmp_path / f"{name}_{part}.csv") for part in range(PARTS)]
+    assert divide_csv_file(str(tmp_path / "input.csv"), output_names, **options)
+    return output_names
+
+
+@pytest.mark.parametrize("strategy", ["hash", "balanced"])
+def test_conversations_stay_intact(tmp_path, strategy):
+    write_export(tmp_path / "input.csv")
+    header, *input_rows = read_rows(tmp_path / "input.csv")
+    parts_of_conversation = {}
+    output_rows = []
+    for part, output_name in enumerate(split(tmp_path, "out", strategy=strategy)):
+        part_header, *rows = read_rows(output_name)
+        assert part_header == header
+        for row in rows:
+            parts_of_conversation.setdefault(row[0], set()).add(part)
+        output_rows += rows
+    assert all(len(parts) == 1 for parts in parts_of_conversation.values())
+    assert sorted(output_rows) == sorted(input_rows)
+
+
+@pytest.mark.parametrize("strategy", ["hash", "balanced"])
+def test_modes_route_rows_identically(tmp_path, strategy):
+    write_export(tmp_path / "input.csv")
+    modes = {
+        "streaming": split(tmp_path, "streaming", strategy=strategy, chunksize=7),
+        "byte_range": split(tmp_path, "byte_range", strategy=strategy, sorted_input=True),
+        "workers": split(tmp_path, "workers", strategy=strategy, sorted_input=True, workers=2),
+    }
+    routed = {mode: [read_rows(name) for name in names] for mode, names in modes.items()}
+    assert routed["streaming"] == routed["byte_range"] == routed["workers"]
+
+
+def test_manifest_describes_the_outputs(tmp_path):
+    write_export(tmp_path / "input.csv")
+    output_names = split(tmp_path, "out", sorted_input=True)
+    with open(tmp_path / f"input{MANIFEST_SUFFIX}", encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert [part["file"] for part in manifest["parts"]] == output_names
+    for part in manifest["parts"]:
+        with open(part["file"], 'rb') as f:
+            data = f.read()
+        assert part["bytes"] == len(data)
+        assert part["sha256"] == hashlib.sha256(data).hexdigest()
+        assert part["rows"] == len(read_rows(part["file"])) - 1
+
+
+def test_splits_into_one_directory_keep_their_manifests(tmp_path):
+    for name, seed in [("first", 1), ("second", 2)]:
+        write_export(tmp_path / f"{name}.csv", seed=seed)
+        assert divide_csv_file(str(tmp_path / f"{name}.csv"), [str(tmp_path / f"{name}_{part}.csv") for part in range(PARTS)])
+    for name in ["first", "second"]:
+        with open(tmp_path / f"{name}{MANIFEST_SUFFIX}", encoding='utf-8') as f:
+            assert json.load(f)["source"] == os.path.abspath(tmp_path / f"{name}.csv")
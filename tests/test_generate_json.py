@@ -0,0 +1,66 @@
+"""
+export_jsonl must write the same lines whatever the chunking, the JSON encoder
+(orjson or the stdlib fallback) and the source (CSV or transcript cache).
+"""
+import json
+
+import pytest
+
+import generate_json
+from conftest import read_bytes, write_transcript
+from generate_json import export_jsonl
+from transcript_cache import load_transcript
+
+
+def test_numeric_ids_are_written_the_same_in_every_chunk(tmp_path):
+    write_transcript(tmp_path / "input.csv", [1, 2, "", 3, 4, 5, "", 6])
+    export_jsonl("input.csv", "out.jsonl", chunksize=4, threads=1)
+    with open(tmp_path / "out.jsonl", encoding='utf-8') as f:
+        conversation_ids = [json.loads(line)["conversation_id"] for line in f]
+    assert set(conversation_ids) <= {"1", "2", "3", "4", "5", "6", None} # Never 3.0 or NaN
+    assert {"1", "6", None} <= set(conversation_ids)
+
+
+@pytest.mark.skipif(generate_json.orjson is None, reason="orjson is not installed")
+def test_stdlib_fallback_writes_the_same_bytes_as_orjson(tmp_path, monkeypatch):
+    write_transcript(tmp_path / "input.csv", ["a-1", "", "b-2", "c-3", "d-4", "e-5", "f-6", "g-7"])
+    export_jsonl("input.csv", "orjson.jsonl", chunksize=5)
+    monkeypatch.setattr(generate_json, "orjson", None)
+    export_jsonl("input.csv", "stdlib.jsonl", chunksize=5)
+    assert read_bytes(tmp_path / "stdlib.jsonl") == read_bytes(tmp_path / "orjson.jsonl")
+
+
+@pytest.mark.parametrize("conversation_ids", [
+    [1, 2, 3, 10], [1, "", 2, 10], ["x", "y", "", "z"], ["007", "010", "", "8"], ["007", "x-1", "010"],
+])
+def test_cache_and_csv_sources_write_the_same_bytes(tmp_path, conversation_ids):
+    write_transcript(tmp_path / "input.csv", conversation_ids)
+    export_jsonl("input.csv", "from_csv.jsonl", chunksize=5)
+    load_transcript("input.csv", flavor="lenient") # What the labeling app caches
+    assert generate_json.find_cached_transcript("input.csv", flavor="lenient")
+    export_jsonl("input.csv", "from_cache.jsonl", chunksize=5)
+    assert read_bytes(tmp_path / "from_cache.jsonl") == read_bytes(tmp_path / "from_csv.jsonl")
+
+
+def test_failed_export_leaves_no_partial_output(tmp_path, monkeypatch):
+    write_transcript(tmp_path / "input.csv", ["a", "b", "c", "d"])
+    (tmp_path / "out.jsonl").write_text("previous result\n")
+
+    def fail(chunk):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(generate_json, "_export_chunk", fail)
+    assert export_jsonl("input.csv", "out.jsonl", chunksize=2) is None
+    assert (tmp_path / "out.jsonl").read_text() == "previous result\n"
+    assert not (tmp_path / "out.jsonl.tmp").exists()
+
+
+def test_zstd_without_zstandard_writes_nothing(tmp_path, monkeypatch):
+    write_transcript(tmp_path / "input.csv", ["a", "b"])
+    real_find_spec = generate_json.importlib.util.find_spec
+    monkeypatch.setattr(
+        generate_json.importlib.util, "find_spec", lambda name, *args: None if name == "zstandard" else real_find_spec(name, *args)
+    )
+    assert export_jsonl("input.csv", "out.jsonl.zst") is None
+    assert not (tmp_path / "out.jsonl.zst").exists()
+    assert not (tmp_path / "out.jsonl.zst.tmp").exists()
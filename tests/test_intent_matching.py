@@ -0,0 +1,209 @@
+"""
+Parity tests for the compiled intent matcher.
+
+The reference is the straightforward loop the matcher replaced: walk
+INTENT_KEYWORDS in order, look for every keyword of an intent in the text, and
+return the first intent with a hit (its leftmost keyword). Keywords match whole
+words, on the same normalized and tokenized text as the matcher.
+"""
+import json
+import random
+
+import pandas as pd
+import pytest
+
+import intent_detection
+from intent_detection import (
+    DEFAULT_INTENT,
+    INTENT_KEYWORDS,
+    assign_intent,
+    compile_intent_matcher,
+    find_intent_hits,
+    match_intent,
+    tokenize,
+)
+from message_parsing import normalize_text
+
+
+def naive_match(text, intent_keywords=INTENT_KEYWORDS):
+    """Returns (intent_name, keyword) the slow way: one scan per keyword, intents in priority order."""
+    tokens = tokenize(normalize_text(text))
+    for intent_name, keywords in intent_keywords:
+        hits = []
+        for keyword in keywords:
+            keyword_tokens = tokenize(normalize_text(keyword))
+            size = len(keyword_tokens)
+            hits += [
+                (position, keyword) for position in range(len(tokens) - size + 1)
+                if tokens[position:position + size] == keyword_tokens
+            ]
+        if hits:
+            return intent_name, min(hits)[1]
+    return DEFAULT_INTENT, None
+
+
+def naive_hits(text, intent_keywords=INTENT_KEYWORDS):
+    """Every (intent_name, keyword) occurrence, first definition of a token sequence only."""
+    tokens = tokenize(normalize_text(text))
+    seen = set()
+    hits = []
+    for intent_name, keywords in intent_keywords:
+        for keyword in keywords:
+            keyword_tokens = tuple(tokenize(normalize_text(keyword)))
+            if not keyword_tokens or keyword_tokens in seen:
+                continue
+            seen.add(keyword_tokens)
+            size = len(keyword_tokens)
+            hits += [
+                (position, intent_name, keyword) for position in range(len(tokens) - size + 1)
+                if tuple(tokens[position:position + size]) == keyword_tokens
+            ]
+    return sorted(hits)
+
+
+def random_texts(intent_keywords, count, seed=0):
+    """Texts mixing keywords, keyword fragments, near misses and filler words."""
+    rng = random.Random(seed)
+    keywords = [keyword for _, group in intent_keywords for keyword in group]
+    words = sorted({token for keyword in keywords for token in tokenize(keyword)})
+    filler = ["the", "my", "token.", "this", "escalated", "OKAY", "meter", "<b>HELLO</b>", "&amp;", "didn’t",
+              "re-send", "retrying", "k.", "number", "please", " ", "\n"]
+    texts = []
+    for _ in range(count):
+        pieces = []
+        for _ in range(rng.randint(0, 12)):
+            kind = rng.random()
+            if kind < 0.25:
+                pieces.append(rng.choice(keywords).upper() if rng.random() < 0.2 else rng.choice(keywords))
+            elif kind < 0.6:
+                pieces.append(rng.choice(words))
+            else:
+                pieces.append(rng.choice(filler))
+        texts.append(" ".join(pieces))
+    return texts
+
+
+# Overlapping keywords, case differences and word boundaries
+EDGE_CASES = [
+    "",
+    "HELLO there",
+    "Chat With An Agent please",
+    "this is fine",                       # "hi" must not fire inside "this"
+    "my token arrived",                   # nor "ok" inside "token"
+    "it was escalated yesterday",         # nor "escalate" inside "escalated"
+    "please retry",                       # "retry" and "please retry" start at different positions
+    "can you try that again",             # "try again" overlaps the longer phrase
+    "meter number is 123, check meter number",
+    "I didn’t get the token",        # curly apostrophe
+    "re-send it or resend it",
+    "<b>Transaction failed</b> &amp; money deducted",
+    "what's happening with my transaction",
+    "ok ok hi",
+    "k",
+    "goodbye, thank you",
+]
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_edge_cases_match_naive_loop(text):
+    assert match_intent(text)[:2] == naive_match(text)
+    assert assign_intent(text) == naive_match(text)[0]
+
+
+def test_random_texts_match_naive_loop():
+    for text in random_texts(INTENT_KEYWORDS, 3000):
+        assert match_intent(text)[:2] == naive_match(text), text
+
+
+def test_find_intent_hits_reports_every_hit():
+    for text in EDGE_CASES + random_texts(INTENT_KEYWORDS, 500, seed=1):
+        match_text = normalize_text(text)
+        got = sorted(
+            (len(tokenize(match_text[:offset])), intent_name, keyword)
+            for intent_name, keyword, offset in find_intent_hits(text)
+        )
+        assert got == naive_hits(text), text
+
+
+def test_match_offset_points_at_keyword():
+    text = "Hello, my <i>meter number is</i> 0123"
+    intent_name, keyword, offset = match_intent(text)
+    assert (intent_name, keyword) == ("Validate Meter Number", "meter number is")
+    assert normalize_text(text)[offset:].startswith(keyword)
+
+
+# A small table with nested and overlapping phrases, swapped into the module's compiled matcher
+CUSTOM_KEYWORDS = [
+    ("First", ["a b c", "b c d"]),
+    ("Second", ["a b", "b", "c d e f"]),
+    ("Third", ["a", "e f", "A B C"]),
+]
+
+
+@pytest.fixture
+def custom_matcher(monkeypatch):
+    vocabulary, single_token_keywords, phrase_index = compile_intent_matcher(CUSTOM_KEYWORDS)
+    monkeypatch.setattr(intent_detection, "_VOCABULARY", vocabulary)
+    monkeypatch.setattr(intent_detection, "_SINGLE_TOKEN_KEYWORDS", single_token_keywords)
+    monkeypatch.setattr(intent_detection, "_PHRASE_INDEX", phrase_index)
+    monkeypatch.setattr(
+        intent_detection, "_BATCH_TABLES",
+        intent_detection._compile_batch_tables(vocabulary, single_token_keywords, phrase_index),
+    )
+
+
+def test_custom_table_matches_naive_loop(custom_matcher):
+    texts = ["a b c d e f", "c d e f", "x a b x", "e f a", "b c d a b c", "a", "A B C", "f e d c b a"]
+    texts += random_texts(CUSTOM_KEYWORDS, 2000, seed=2)
+    for text in texts:
+        assert match_intent(text)[:2] == naive_match(text, CUSTOM_KEYWORDS), text
+
+
+def _scored(texts, intent_keywords=INTENT_KEYWORDS):
+    """Per-message (intent_name, keyword) from the vectorized batch scorer."""
+    tables = intent_detection._BATCH_TABLES
+    intent_names = [intent_name for intent_name, _ in intent_keywords]
+    ranks = intent_detection._score_messages(pd.Series([normalize_text(text) for text in texts]))
+    return [
+        (intent_names[tables["rank_priority"][rank]], tables["rank_keyword"][rank]) if rank >= 0
+        else (DEFAULT_INTENT, None)
+        for rank in ranks.tolist()
+    ]
+
+
+def test_score_messages_matches_naive_loop():
+    texts = EDGE_CASES + random_texts(INTENT_KEYWORDS, 3000, seed=3)
+    assert _scored(texts) == [naive_match(text) for text in texts]
+
+
+def test_score_messages_custom_table(custom_matcher):
+    texts = ["a b c d e f", "c d e f", "x a b x", "e f a", "b c d a b c", ""]
+    texts += random_texts(CUSTOM_KEYWORDS, 2000, seed=4)
+    assert _scored(texts, CUSTOM_KEYWORDS) == [naive_match(text, CUSTOM_KEYWORDS) for text in texts]
+
+
+def test_count_keyword_hits_counts_every_hit():
+    texts = EDGE_CASES + random_texts(INTENT_KEYWORDS, 500, seed=5)
+    expected = {}
+    for text in texts:
+        for _, intent_name, keyword in naive_hits(text):
+            expected.setdefault(intent_name, {}).setdefault(keyword, 0)
+            expected[intent_name][keyword] += 2
+    token_id_lists = [intent_detection._token_ids(normalize_text(text)) for text in texts]
+    assert intent_detection._count_keyword_hits(token_id_lists, [2] * len(texts)) == expected
+
+
+@pytest.mark.parametrize("per_message", [False, True])
+def test_report_counts_losing_keywords(tmp_path, per_message):
+    (tmp_path / "input.csv").write_text(
+        "conversation_id,actor_type,message_parts\n"
+        + "".join(f'1,user,"[{{""text"": {{""content"": ""{text}""}}}}]"\n' for text in ["hello", "hi", "retry"])
+    )
+    intent_detection.process_chat_transcript(
+        "input.csv", "out.csv", report_path="report.json", per_message=per_message
+    )
+    with open(tmp_path / "report.json", encoding="utf-8") as f:
+        summary = json.load(f)["intents"]
+    hits = {keyword: n for keywords in summary["keyword_hits"].values() for keyword, n in keywords.items()}
+    assert summary["conversations"] == 1
+    assert {keyword: hits.get(keyword) for keyword in ["hello", "hi", "retry"]} == {"hello": 1, "hi": 1, "retry": 1}
@@ -0,0 +1,161 @@
+"""
+The chunked modes of intent_detection.py (streaming, streaming after an
+on-disk sort) must write byte-for-byte the same CSV as the in-memory
+process_chat_transcript, whatever the type of the conversation IDs.
+"""
+import csv
+import json
+from itertools import islice
+
+import pytest
+
+import intent_detection
+from conftest import read_bytes, write_transcript
+from intent_detection import (
+    process_chat_transcript,
+    process_chat_transcript_incremental,
+    process_chat_transcript_parallel,
+    process_chat_transcript_streaming,
+)
+
+# Conversation IDs that sort differently as text and as numbers, with and without a missing ID
+ID_SETS = {
+    "text": ["c-10", "c-2", "b", "a-1", "c-100"],
+    "integer": [1, 2, 3, 9, 10, 11, 100],
+    "integer_with_missing": [1, 2, 3, 9, 10, 11, 100, ""],
+}
+
+
+@pytest.mark.parametrize("id_set", ID_SETS)
+def test_streaming_sorted_input_matches_in_memory(tmp_path, id_set):
+    write_transcript(tmp_path / "input.csv", ID_SETS[id_set], sort=True)
+    process_chat_transcript(str(tmp_path / "input.csv"), str(tmp_path / "memory.csv"))
+    process_chat_transcript_streaming(str(tmp_path / "input.csv"), str(tmp_path / "stream.csv"), chunksize=3)
+    assert read_bytes(tmp_path / "stream.csv") == read_bytes(tmp_path / "memory.csv")
+
+
+@pytest.mark.parametrize("id_set", ID_SETS)
+def test_streaming_unsorted_input_matches_in_memory(tmp_path, id_set):
+    write_transcript(tmp_path / "input.csv", ID_SETS[id_set], sort=False)
+    process_chat_transcript(str(tmp_path / "input.csv"), str(tmp_path / "memory.csv"))
+    process_chat_transcript_streaming(
+        str(tmp_path / "input.csv"), str(tmp_path / "stream.csv"), chunksize=3, assume_sorted=False
+    )
+    assert read_bytes(tmp_path / "stream.csv") == read_bytes(tmp_path / "memory.csv")
+
+
+@pytest.mark.parametrize("id_set", ID_SETS)
+def test_parallel_matches_in_memory(tmp_path, id_set):
+    write_transcript(tmp_path / "input.csv", ID_SETS[id_set], sort=False)
+    process_chat_transcript(str(tmp_path / "input.csv"), str(tmp_path / "memory.csv"))
+    process_chat_transcript_parallel(str(tmp_path / "input.csv"), str(tmp_path / "parallel.csv"), workers=3, chunksize=3)
+    assert read_bytes(tmp_path / "parallel.csv") == read_bytes(tmp_path / "memory.csv")
+
+
+def test_numeric_ids_keep_numeric_order(tmp_path):
+    write_transcript(tmp_path / "input.csv", ID_SETS["integer"], sort=False)
+    process_chat_transcript_streaming(
+        str(tmp_path / "input.csv"), str(tmp_path / "stream.csv"), chunksize=3, assume_sorted=False
+    )
+    with open(tmp_path / "stream.csv", newline='', encoding='utf-8') as f:
+        conversation_ids = list(dict.fromkeys(row[0] for row in list(csv.reader(f))[1:]))
+    assert conversation_ids == ["1", "2", "3", "9", "10", "11", "100"]
+
+
+def test_failed_stream_leaves_no_partial_output(tmp_path, monkeypatch):
+    write_transcript(tmp_path / "input.csv", ID_SETS["integer"], sort=True)
+    (tmp_path / "out.csv").write_text("previous result\n")
+    labelled = []
+
+    def fail_on_second_frame(df, per_message=False):
+        if labelled:
+            raise RuntimeError("boom")
+        labelled.append(df)
+        return real_label(df, per_message)
+
+    real_label = intent_detection._label_conversations
+    monkeypatch.setattr(intent_detection, "_label_conversations", fail_on_second_frame)
+    process_chat_transcript_streaming(str(tmp_path / "input.csv"), str(tmp_path / "out.csv"), chunksize=3, threads=1)
+    assert (tmp_path / "out.csv").read_text() == "previous result\n" # Untouched
+    assert not (tmp_path / "out.csv.tmp").exists()
+
+
+def test_unsorted_stream_leaves_no_output(tmp_path):
+    write_transcript(tmp_path / "input.csv", ID_SETS["integer"], sort=False)
+    process_chat_transcript_streaming(str(tmp_path / "input.csv"), str(tmp_path / "out.csv"), chunksize=3)
+    assert not (tmp_path / "out.csv").exists()
+    assert not (tmp_path / "out.csv.tmp").exists()
+
+
+def edit_transcript(path, edit_id, remove_id, add_id):
+    """Edits one conversation's first message, removes one conversation and appends a new one."""
+    with open(path, newline='', encoding='utf-8') as f:
+        header, *rows = list(csv.reader(f))
+    edited = False
+    for row in rows:
+        if row[0] == str(edit_id) and not edited:
+            row[2] = json.dumps([{"text": {"content": "i want to chat with an agent"}}])
+            edited = True
+    rows = [row for row in rows if row[0] != str(remove_id)]
+    rows.append([str(add_id), "user", json.dumps([{"text": {"content": "meter number is 42"}}])])
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+@pytest.mark.parametrize("id_set", ["text", "integer"])
+def test_incremental_matches_full_run_after_edits(tmp_path, capsys, id_set):
+    conversation_ids = ID_SETS[id_set]
+    write_transcript(tmp_path / "input.csv", conversation_ids, sort=False)
+    assert process_chat_transcript_incremental("input.csv", "incremental.csv")
+
+    edit_transcript(tmp_path / "input.csv", conversation_ids[1], conversation_ids[2], "999")
+    capsys.readouterr()
+    assert process_chat_transcript_incremental("input.csv", "incremental.csv")
+    assert "1 new, 1 changed, 1 removed" in capsys.readouterr().out
+    process_chat_transcript("input.csv", "full.csv")
+    assert read_bytes(tmp_path / "incremental.csv") == read_bytes(tmp_path / "full.csv")
+
+
+def test_incremental_empty_input(tmp_path):
+    (tmp_path / "input.csv").write_text("conversation_id,actor_type,message_parts\n")
+    assert process_chat_transcript_incremental("input.csv", "incremental.csv")
+    assert process_chat_transcript_incremental("input.csv", "incremental.csv")
+    process_chat_transcript("input.csv", "full.csv")
+    assert read_bytes(tmp_path / "incremental.csv") == read_bytes(tmp_path / "full.csv")
+    assert read_bytes(tmp_path / "full.csv").startswith(b"Conversation ID,Speaker,Message,Intent")
+
+
+@pytest.mark.parametrize("keep_manifest_fingerprint", [False, True])
+def test_incremental_recomputes_when_output_was_overwritten(tmp_path, keep_manifest_fingerprint):
+    write_transcript(tmp_path / "input.csv", ID_SETS["integer"], sort=False)
+    write_transcript(tmp_path / "other.csv", ID_SETS["text"], sort=False)
+    assert process_chat_transcript_incremental("input.csv", "out.csv")
+    process_chat_transcript("other.csv", "out.csv") # Another run writes to the same output
+    if keep_manifest_fingerprint:
+        # Even a manifest that (wrongly) vouches for the new file must not drop conversations
+        with open(tmp_path / "out.csv.manifest.json", encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest["output"] = intent_detection._file_fingerprint("out.csv")
+        with open(tmp_path / "out.csv.manifest.json", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+
+    assert process_chat_transcript_incremental("input.csv", "out.csv")
+    process_chat_transcript("input.csv", "full.csv")
+    assert read_bytes(tmp_path / "out.csv") == read_bytes(tmp_path / "full.csv")
+
+
+def test_failed_parallel_merge_leaves_no_partial_output(tmp_path, monkeypatch):
+    write_transcript(tmp_path / "input.csv", ID_SETS["integer"], sort=False)
+    (tmp_path / "out.csv").write_text("previous result\n")
+    real_merge = intent_detection.heapq.merge
+
+    def merge_then_fail(*iterables, key=None):
+        yield from islice(real_merge(*iterables, key=key), 3)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(intent_detection.heapq, "merge", merge_then_fail)
+    assert not process_chat_transcript_parallel(str(tmp_path / "input.csv"), str(tmp_path / "out.csv"), workers=2)
+    assert (tmp_path / "out.csv").read_text() == "previous result\n"
+    assert not (tmp_path / "out.csv.tmp").exists()
@@ -0,0 +1,74 @@
+"""
+The transcript cache must stay correct, and never fail its caller, when jobs
+share one cache directory, and must not keep entries of edited files around.
+"""
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import transcript_cache
+from transcript_cache import load_transcript, source_digest
+
+TRANSCRIPT = 'conversation_id,actor_type,message_parts\n1,user,"[{""text"": {""content"": ""hello""}}]"\n'
+
+
+def _rehash_all(paths, cache_dir, worker):
+    """Touches every file (forcing a re-hash) and hashes it; returns the digests."""
+    digests = []
+    for round_number in range(3):
+        for path in paths:
+            os.utime(path, ns=(0, (worker * 10 + round_number) * 10**9))
+            digests.append(source_digest(path, cache_dir))
+    return digests
+
+
+def test_concurrent_jobs_share_the_index(tmp_path):
+    paths = []
+    for number in range(16):
+        path = tmp_path / f"part_{number}.csv"
+        path.write_text(TRANSCRIPT + f"{number},bot,[]\n")
+        paths.append(str(path))
+    cache_dir = str(tmp_path / "cache")
+    with ProcessPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(_rehash_all, [paths] * 8, [cache_dir] * 8, range(8)))
+    expected = [transcript_cache._file_digest(path) for path in paths] * 3
+    assert all(digests == expected for digests in results)
+    assert not glob.glob(os.path.join(cache_dir, "*.tmp"))
+
+
+def test_index_write_failure_is_not_fatal(tmp_path, capsys):
+    (tmp_path / "input.csv").write_text(TRANSCRIPT)
+    os.makedirs(tmp_path / "cache" / transcript_cache._INDEX_FILENAME) # The index cannot be replaced
+    df = load_transcript(str(tmp_path / "input.csv"), flavor="strict", cache_dir=str(tmp_path / "cache"))
+    assert df["parsed_message_content"].tolist() == ["hello"]
+    assert "Could not update the transcript cache index" in capsys.readouterr().out
+
+
+def test_editing_a_file_evicts_its_old_entries(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    (tmp_path / "input.csv").write_text(TRANSCRIPT)
+    for flavor in ["strict", "lenient"]:
+        load_transcript(str(tmp_path / "input.csv"), flavor=flavor, cache_dir=cache_dir)
+    assert len(glob.glob(os.path.join(cache_dir, "*.parquet"))) == 2
+
+    (tmp_path / "input.csv").write_text(TRANSCRIPT + "2,user,[]\n")
+    load_transcript(str(tmp_path / "input.csv"), flavor="strict", cache_dir=cache_dir)
+    new_digest = transcript_cache._file_digest(str(tmp_path / "input.csv"))
+    entries = glob.glob(os.path.join(cache_dir, "*.parquet"))
+    assert len(entries) == 1 and os.path.basename(entries[0]).startswith(new_digest)
+
+
+def test_entries_shared_with_another_file_are_kept(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    (tmp_path / "input.csv").write_text(TRANSCRIPT)
+    (tmp_path / "copy.csv").write_text(TRANSCRIPT)
+    load_transcript(str(tmp_path / "input.csv"), flavor="strict", cache_dir=cache_dir)
+    source_digest(str(tmp_path / "copy.csv"), cache_dir)
+
+    (tmp_path / "input.csv").write_text(TRANSCRIPT + "2,user,[]\n")
+    source_digest(str(tmp_path / "input.csv"), cache_dir)
+    assert len(glob.glob(os.path.join(cache_dir, "*.parquet"))) == 1 # copy.csv still has these contents
+
+    (tmp_path / "copy.csv").write_text(TRANSCRIPT + "3,user,[]\n")
+    source_digest(str(tmp_path / "copy.csv"), cache_dir)
+    assert not glob.glob(os.path.join(cache_dir, "*.parquet"))
@@ -0,0 +1,252 @@
+"""
+On-disk Parquet cache of parsed chat transcript exports.
+
+Every script starts by reading the raw export CSV and decoding `message_parts`,
+which dominates start-up time on large exports. load_transcript() does that
+work once and stores the result as Parquet in CACHE_DIR, with `conversation_id`
+and `actor_type` stored as dictionary-encoded categoricals.
+
+A cache entry is keyed by the SHA-256 of the source file contents. The file's
+size and mtime are remembered next to its hash, so unchanged files are
+recognised without re-hashing them; touching or editing a file triggers a
+re-hash, and the entry is rebuilt only if the contents really changed. When a
+file's contents change, the entries built from its old contents are deleted.
+
+Several jobs may share one cache directory: every write goes through a
+temporary file of its own, and a failed cache write never fails the caller.
+
+Parquet support needs pyarrow. Without it the cache is skipped and the CSV is
+parsed directly, exactly as before.
+"""
+import contextlib
+import hashlib
+import importlib.util
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+from message_parsing import (
+    extract_message_content,
+    extract_message_content_lenient,
+    normalize_for_matching,
+    strip_html,
+)
+from run_report import stage
+
+CACHE_DIR = ".transcript_cache"
+
+# Bump when the parsers or the cached layout change, to invalidate old entries
+CACHE_VERSION = 2
+
+CONVERSATION_ID_COL = 'conversation_id'
+ACTOR_TYPE_COL = 'actor_type'
+MESSAGE_PARTS_COL = 'message_parts'
+PARSED_CONTENT_COL = 'parsed_message_content'
+DISPLAY_TEXT_COL = 'display_text' # HTML tags stripped, as shown to annotators
+MATCH_TEXT_COL = 'match_text' # Normalized and lowercased, for keyword matching
+
+# Parser flavours, see message_parsing.py
+PARSERS = {
+    "strict": extract_message_content,
+    "lenient": extract_message_content_lenient,
+}
+
+_INDEX_FILENAME = "index.json"
+
+
+def _file_digest(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, _INDEX_FILENAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _replace_atomically(path, write):
+    """
+    Calls write(tmp_path) on a new, uniquely named temporary file next to path,
+    then renames it over path. The temporary file is removed if anything fails.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def _save_index(cache_dir, index):
+    """Writes the index; a failure only costs a re-hash later, so it is reported and ignored."""
+    index_path = os.path.join(cache_dir, _INDEX_FILENAME)
+
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+
+    try:
+        _replace_atomically(index_path, write)
+    except Exception as e:
+        print(f"Warning: Could not update the transcript cache index '{index_path}': {e}")
+
+
+def _remove_entries(cache_dir, digest):
+    """Deletes the cache entries built from contents with the given digest."""
+    for name in os.listdir(cache_dir):
+        if name.startswith(digest + "-") and name.endswith(".parquet"):
+            with contextlib.suppress(OSError): # e.g. still open in another process on Windows
+                os.remove(os.path.join(cache_dir, name))
+
+
+def source_digest(csv_path, cache_dir=CACHE_DIR):
+    """
+    Returns the content hash of csv_path, re-using the remembered hash when the
+    file's size and mtime have not changed since it was last computed.
+    """
+    stat = os.stat(csv_path)
+    key = os.path.abspath(csv_path)
+    index = _load_index(cache_dir)
+    entry = index.get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = _file_digest(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    if entry and entry["sha256"] != digest:
+        # The old contents can only be hit again through another file with the same contents
+        if not any(other["sha256"] == entry["sha256"] for other_key, other in index.items() if other_key != key):
+            _remove_entries(cache_dir, entry["sha256"])
+    index[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    _save_index(cache_dir, index)
+    return digest
+
+
+def add_message_columns(df, flavor, message_parts_col=MESSAGE_PARTS_COL, normalize=False, report=None):
+    """
+    The parsing stage shared by every reader: decodes message_parts with the
+    given parser flavour into 'parsed_message_content' and drops the raw JSON
+    column right away, so the frame never holds both copies of every message.
+    With normalize, the same stage also adds 'display_text' and 'match_text'
+    (see message_parsing.normalize_for_matching). Modifies df in place.
+
+    Bot and agent templates repeat constantly, so the payloads are factorized
+    first: parsing and normalization run once per distinct payload and the
+    results are scattered back to the rows through the integer codes.
+    """
+    with stage(report, "dedup_payloads") as s:
+        codes, payloads = pd.factorize(df.pop(message_parts_col), use_na_sentinel=False)
+        payloads = pd.Series(payloads)
+        s["rows"] = len(df)
+        s["unique_payloads"] = len(payloads)
+    with stage(report, "parse_message_parts") as s:
+        parsed = payloads.map(PARSERS[flavor])
+        df[PARSED_CONTENT_COL] = _scatter(parsed, codes, df.index)
+        s["rows"] = len(payloads)
+    if normalize:
+        with stage(report, "normalize_text") as s:
+            display_text = strip_html(parsed)
+            df[DISPLAY_TEXT_COL] = _scatter(display_text, codes, df.index)
+            df[MATCH_TEXT_COL] = _scatter(normalize_for_matching(display_text, html_stripped=True), codes, df.index)
+            s["rows"] = len(payloads)
+    return df
+
+
+def _scatter(unique_values, codes, index):
+    """Expands per-payload results back to one value per row."""
+    return unique_values.take(codes).set_axis(index)
+
+
+def parse_transcript_csv(csv_path, flavor=None, conversation_id_col=CONVERSATION_ID_COL,
+                         actor_type_col=ACTOR_TYPE_COL, message_parts_col=MESSAGE_PARTS_COL, normalize=False,
+                         report=None):
+    """
+    Reads the conversation ID, actor type and message_parts columns of a
+    transcript export (other columns are never loaded). The conversation ID and
+    actor type become categoricals.
+
+    When flavor is given, message_parts is replaced by the parsed (and, with
+    normalize, display and matching) text columns; see add_message_columns.
+    The CSV read and the parsing are timed as separate stages of report.
+    """
+    columns = (conversation_id_col, actor_type_col, message_parts_col)
+    with stage(report, "read_csv") as s:
+        # Conversation IDs keep their inferred type (numeric IDs must sort as
+        # numbers) and are made categorical after the read
+        df = pd.read_csv(csv_path, usecols=lambda col: col in columns, dtype={actor_type_col: "category"})
+        s["rows"] = len(df)
+    if conversation_id_col in df.columns:
+        df[conversation_id_col] = df[conversation_id_col].astype("category")
+    if flavor is not None and message_parts_col in df.columns:
+        add_message_columns(df, flavor, message_parts_col, normalize, report)
+    return df
+
+
+def _cache_path(csv_path, flavor, columns, cache_dir, normalize=False):
+    digest = source_digest(csv_path, cache_dir)
+    variant = hashlib.sha256(repr((CACHE_VERSION, flavor, columns, normalize)).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{digest}-{flavor or 'raw'}-{variant}.parquet")
+
+
+def find_cached_transcript(csv_path, flavor=None, cache_dir=CACHE_DIR, conversation_id_col=CONVERSATION_ID_COL,
+                           actor_type_col=ACTOR_TYPE_COL, message_parts_col=MESSAGE_PARTS_COL, normalize=False):
+    """
+    Returns the path of a valid Parquet cache entry for csv_path, or None.
+    Unlike load_transcript this never builds an entry, so streaming readers can
+    use the cache when it exists without loading the whole file to create it.
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        return None
+    columns = (conversation_id_col, actor_type_col, message_parts_col)
+    cache_path = _cache_path(csv_path, flavor, columns, cache_dir, normalize)
+    return cache_path if os.path.exists(cache_path) else None
+
+
+def load_transcript(csv_path, flavor=None, cache_dir=CACHE_DIR, conversation_id_col=CONVERSATION_ID_COL,
+                    actor_type_col=ACTOR_TYPE_COL, message_parts_col=MESSAGE_PARTS_COL, normalize=False, report=None):
+    """
+    Returns parse_transcript_csv(csv_path, flavor, ...), served from the Parquet
+    cache when a valid entry exists and stored there otherwise.
+    flavor is "strict", "lenient" or None (raw columns only); normalize also
+    caches the display and matching text.
+    Loading is recorded in report (see run_report.py), with "cache_hit" set.
+    """
+    columns = (conversation_id_col, actor_type_col, message_parts_col)
+    if importlib.util.find_spec("pyarrow") is None:
+        return parse_transcript_csv(csv_path, flavor, *columns, normalize=normalize, report=report)
+
+    with stage(report, "hash_source"):
+        cache_path = _cache_path(csv_path, flavor, columns, cache_dir, normalize)
+    if os.path.exists(cache_path):
+        try:
+            with stage(report, "read_cache") as s:
+                df = pd.read_parquet(cache_path)
+                s["rows"] = len(df)
+            if report is not None:
+                report["cache_hit"] = True
+            print(f"Loaded '{csv_path}' from cache ({len(df)} rows).")
+            return df
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable cache entry '{cache_path}': {e}")
+
+    if report is not None:
+        report["cache_hit"] = False
+    df = parse_transcript_csv(csv_path, flavor, *columns, normalize=normalize, report=report)
+    try:
+        with stage(report, "write_cache") as s:
+            _replace_atomically(cache_path, lambda tmp_path: df.to_parquet(tmp_path, index=False))
+            s["rows"] = len(df)
+    except Exception as e:
+        print(f"Warning: Could not write transcript cache '{cache_path}': {e}")
+    return df